@@ -1,11 +1,17 @@
 import argparse
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
 import math
 
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from csv_io import base_stem, is_columnar, open_text
+from datum_parser import date_mask, parse_bound, parse_dates, range_label
+import groupby_kernel as gk
+import sqlite_store
+
 # Standard-Konfiguration – bei Bedarf anpassen
 DELIMITER = ";"
 
@@ -23,6 +29,7 @@ POSSIBLE_NAT_COLS = [
     "staatsangehoerigkeit",  # fallback klein
 ]
 POSSIBLE_AGE_COLS = ["Alter", "alter"]
+POSSIBLE_DATE_COLS = ["Datum", "datum", "Stichtag", "stichtag"]
 
 # Feste Altersgruppen für alle Quartiere
 AGE_BINS = [0, 6, 12, 18, 25, 35, 45, 65, 80, 90, 100, math.inf]
@@ -45,6 +52,9 @@ AGE_LABELS = [
 MIN_SHARE_FOR_OWN_CATEGORY = 0.01
 MAX_CATEGORIES = 15  # Sicherheitslimit, damit die Legende nicht explodiert
 
+# Hilfsspalte, falls nach Stichtag statt nach Jahr gruppiert werden muss
+STICHTAG_COLUMN = "_stichtag"
+
 
 def guess_col(possible_names, columns, what: str, required: bool = True):
     """Sucht eine Spalte unabhängig von Gross-/Kleinschreibung."""
@@ -61,8 +71,58 @@ def guess_col(possible_names, columns, what: str, required: bool = True):
     return None
 
 
-def load_data(path: Path) -> pd.DataFrame:
-    df = pd.read_csv(path, delimiter=DELIMITER, encoding="utf-8-sig", low_memory=False)
+def numeric_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Text-Spalten, die nur Zahlen enthalten, wie bei read_csv numerisch machen."""
+    for col in df.columns:
+        values = df[col].astype(object)
+        try:
+            df[col] = pd.to_numeric(values)
+        except (ValueError, TypeError):
+            df[col] = values
+    return df
+
+
+def period_column(df: pd.DataFrame, year_col: str) -> tuple[pd.DataFrame, str]:
+    """Spalte, nach der die Diagramme gruppieren: normalerweise das Jahr.
+
+    Gibt es in einem Jahr mehrere Stichtage (z.B. 30. Juni und 31. Dezember),
+    würden beim Summieren pro Jahr dieselben Personen doppelt gezählt – dann
+    wird nach dem geparsten Stichtag gruppiert.
+    """
+    date_col = guess_col(POSSIBLE_DATE_COLS, df.columns, "Datum", required=False)
+    if date_col is None or (df.groupby(year_col)[date_col].nunique() <= 1).all():
+        return df, year_col
+
+    df = df.assign(**{STICHTAG_COLUMN: parse_dates(df[date_col])})
+    return df.dropna(subset=[STICHTAG_COLUMN]), STICHTAG_COLUMN
+
+
+def period_label(value) -> str:
+    """Beschriftung eines Jahres (2023) bzw. Stichtags (30.06.2023)."""
+    if isinstance(value, (np.datetime64, date)):
+        return pd.Timestamp(value).strftime("%d.%m.%Y")
+    return str(int(value))
+
+
+def load_data(path: Path,
+              quartier: str | None = None,
+              jahr: int | None = None) -> pd.DataFrame:
+    # Datenbank aus sqlite_store.py: Filter und Summen laufen direkt in SQL
+    if sqlite_store.is_database(path):
+        return sqlite_store.load_aggregated(path, quartier, jahr)
+
+    # Parquet/Feather (z.B. aus filter.py --format parquet) direkt laden
+    if is_columnar(path):
+        if path.suffix.lower() == ".parquet":
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_feather(path)
+        # filter.py schreibt Anzahl/Jahr als Zahl, alles andere als (Dictionary-)Text
+        return numeric_columns(df)
+
+    # CSV, auch komprimiert (.gz, .zst, ...), wird als Stream gelesen
+    with open_text(path) as f_in:
+        df = pd.read_csv(f_in, delimiter=DELIMITER, low_memory=False)
     return df
 
 
@@ -79,7 +139,13 @@ def auto_plot(df: pd.DataFrame,
     df[year_col] = pd.to_numeric(df[year_col], errors="coerce")
     df = df.dropna(subset=[year_col])
 
-    years = sorted(df[year_col].unique())
+    # Bei mehreren Stichtagen pro Jahr nach Stichtag statt nach Jahr gruppieren
+    df, year_col = period_column(df, year_col)
+    period_name = "Stichtag" if year_col == STICHTAG_COLUMN else "Jahr"
+
+    # Jahre einmal in Codes übersetzen (sortiert, wie groupby)
+    year_codes, year_index = gk.factorize(df[year_col])
+    years = list(year_index.to_numpy())
     n_years = len(years)
     if n_years == 0:
         raise SystemExit("Keine gültigen Jahreswerte gefunden.")
@@ -88,7 +154,9 @@ def auto_plot(df: pd.DataFrame,
     age_col = guess_col(POSSIBLE_AGE_COLS, df.columns, "Alter", required=False)
     if age_col is not None:
         print("Altersspalte erkannt -> Altersdiagramm")
-        return auto_plot_age(df, year_col, age_col, count_col, output_path, title_prefix)
+        return auto_plot_age(
+            df, year_col, age_col, count_col, output_path, title_prefix, period_name
+        )
 
     # Sonst: Nationalitäten-Mode
     nat_col = guess_col(POSSIBLE_NAT_COLS, df.columns, "Staatsangehörigkeit")
@@ -97,13 +165,19 @@ def auto_plot(df: pd.DataFrame,
     if nationality_filter:
         return plot_nationality_trend(
             df, year_col, nat_col, count_col,
-            nationality_filter, output_path, title_prefix
+            nationality_filter, output_path, title_prefix, period_name
         )
 
-    nats = df[nat_col].dropna().unique()
-    n_nat = len(nats)
+    nat_codes, nat_index = gk.factorize(df[nat_col])
+    n_nat = len(nat_index)
+
+    # Matrix Jahr × Nationalität mit den Personensummen
+    matrix = gk.sum_matrix(year_codes, n_years, nat_codes, n_nat, df[count_col].to_numpy())
 
-    print(f"Gefundene Jahre: {years}")
+    if period_name == "Jahr":
+        print(f"Gefundene Jahre: {years}")
+    else:
+        print(f"Gefundene Stichtage: {[period_label(y) for y in years]}")
     print(f"Anzahl Nationalitäten: {n_nat}")
 
     # ------------------------------------------------------------------
@@ -111,27 +185,19 @@ def auto_plot(df: pd.DataFrame,
     # ------------------------------------------------------------------
     if n_years == 1:
         year = years[0]
-        grouped = (
-            df.groupby(nat_col)[count_col]
-            .sum()
-            .sort_values(ascending=False)
-        )
-
-        total = grouped.sum()
-        shares = grouped / total
+        sums = matrix[0]
+        total = sums.sum()
 
         print(
             f"Schwelle für eigene Kategorie: "
             f"{MIN_SHARE_FOR_OWN_CATEGORY * 100:.1f}% des Gesamtbestands."
         )
 
-        # Nach Anteil filtern: alles unterhalb der Schwelle in "Restliche"
-        mask_keep = shares >= MIN_SHARE_FOR_OWN_CATEGORY
-        keep = grouped[mask_keep]
-
-        # Falls immer noch zu viele Kategorien: Top-N nehmen
-        if len(keep) > MAX_CATEGORIES:
-            keep = keep.head(MAX_CATEGORIES)
+        # Nach Anteil filtern (alles unterhalb der Schwelle in "Restliche"),
+        # falls immer noch zu viele Kategorien: Top-N nehmen
+        keep_idx = gk.share_selection(sums, MIN_SHARE_FOR_OWN_CATEGORY, MAX_CATEGORIES)
+        keep = pd.Series(sums[keep_idx], index=nat_index[keep_idx], name=count_col)
+        keep.index.name = nat_col
 
         rest_sum = total - keep.sum()
 
@@ -156,7 +222,7 @@ def auto_plot(df: pd.DataFrame,
                 startangle=90,
             )
             ax.axis("equal")  # Kreis
-            title = f"{title_prefix} – Nationalitätenverteilung {int(year)}"
+            title = f"{title_prefix} – Nationalitätenverteilung {period_label(year)}"
             ax.set_title(title)
 
             plt.tight_layout()
@@ -173,7 +239,7 @@ def auto_plot(df: pd.DataFrame,
             grouped.sort_values().plot(kind="barh", ax=ax)
             ax.set_xlabel("Anzahl Personen")
             ax.set_ylabel("Staatsangehörigkeit")
-            title = f"{title_prefix} – Nationalitätenverteilung {int(year)}"
+            title = f"{title_prefix} – Nationalitätenverteilung {period_label(year)}"
             ax.set_title(title)
             ax.grid(axis="x", linestyle=":", alpha=0.5)
 
@@ -192,62 +258,34 @@ def auto_plot(df: pd.DataFrame,
     # Fall B: Mehrere Jahre → gestapeltes Flächendiagramm (Nationalität)
     # ------------------------------------------------------------------
 
-    grouped = (
-        df.groupby([year_col, nat_col])[count_col]
-        .sum()
-        .reset_index()
-    )
-
-    # Pivot: Zeilen = Jahr, Spalten = Nationalität
-    pivot = grouped.pivot(index=year_col, columns=nat_col, values=count_col)
-    pivot = pivot.sort_index()
-
     # Wie viele Nationalitäten explizit zeigen? (Schweiz + X grösste + Restliche)
     max_bands_without_rest = 10
 
-    totals = (
-        grouped.groupby(nat_col)[count_col]
-        .sum()
-        .sort_values(ascending=False)
-    )
-
-    selected_nats = []
-
-    # Schweiz immer explizit
-    if "Schweiz" in totals.index:
-        selected_nats.append("Schweiz")
-
-    # Danach die grössten anderen Nationalitäten
-    for nat in totals.index:
-        if nat == "Schweiz":
-            continue
-        if len(selected_nats) >= max_bands_without_rest:
-            break
-        selected_nats.append(nat)
+    # Schweiz immer explizit, danach die grössten anderen Nationalitäten
+    totals = matrix.sum(axis=0)
+    selected_nats = gk.top_selection(totals, nat_index, "Schweiz", max_bands_without_rest)
 
     print("Explizit dargestellte Nationalitäten:", selected_nats)
 
-    stack_df = pivot[selected_nats].fillna(0)
-
-    # Gesamtbevölkerung pro Jahr
-    total_per_year = pivot.sum(axis=1).fillna(0)
+    # Zeilen = Jahr (sortiert), Spalten = ausgewählte Nationalitäten
+    selected_idx = nat_index.get_indexer(selected_nats)
+    stack = matrix[:, selected_idx]
 
     # Restliche = Gesamt – Summe der ausgewählten Nationalitäten
-    rest = total_per_year - stack_df.sum(axis=1)
+    rest = matrix.sum(axis=1) - stack.sum(axis=1)
     rest_name = "Restliche"
-    stack_df[rest_name] = rest
 
     plot_columns = selected_nats + [rest_name]
 
     # Gestapeltes Flächendiagramm
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.stackplot(
-        stack_df.index.values,
-        [stack_df[col].values for col in plot_columns],
+        year_index.to_numpy(),
+        [stack[:, i] for i in range(len(selected_nats))] + [rest],
         labels=plot_columns
     )
 
-    ax.set_xlabel("Jahr")
+    ax.set_xlabel(period_name)
     ax.set_ylabel("Anzahl Personen")
     title = f"{title_prefix} – Nationalitätenzusammensetzung"
     ax.set_title(title)
@@ -268,43 +306,62 @@ def plot_nationality_trend(df: pd.DataFrame,
                            count_col: str,
                            nationality: str,
                            output_path: Path,
-                           title_prefix: str):
+                           title_prefix: str,
+                           period_name: str = "Jahr"):
     """Zeitverlauf einer Staatsangehörigkeit + jährliche Veränderung."""
-    df_nat = df[df[nat_col] == nationality].copy()
+    mask = (df[nat_col] == nationality).to_numpy()
 
-    if df_nat.empty:
+    if not mask.any():
         raise SystemExit(f"Keine Daten für Staatsangehörigkeit '{nationality}' gefunden.")
 
-    series = (
-        df_nat.groupby(year_col)[count_col]
-        .sum()
-        .sort_index()
-    )
+    # Summe pro Jahr, nur Jahre mit Einträgen für diese Nationalität
+    year_codes, year_index = gk.factorize(df[year_col].to_numpy()[mask])
+    n_years = len(year_index)
+    zeros = np.zeros(len(year_codes), dtype=np.intp)
+    totals = gk.sum_matrix(zeros, 1, year_codes, n_years, df[count_col].to_numpy()[mask])[0]
 
     # Jährliche Veränderung (Differenz zum Vorjahr)
-    delta = series.diff().fillna(0)
+    delta = np.zeros(n_years, dtype=np.float64)
+    delta[1:] = np.diff(totals)
 
+    plot_trend(year_index, totals, delta, nationality, output_path, title_prefix, period_name)
+
+
+def plot_trend(years, totals, deltas, nationality: str, output_path: Path, title_prefix: str,
+               period_name: str = "Jahr"):
+    """Zeichnet Anzahl pro Jahr (oben) und Veränderung zum Vorjahr (unten).
+
+    period_name="Stichtag": years sind Stichtage (datetime64) statt Jahreszahlen.
+    """
+    previous = "Vorjahr" if period_name == "Jahr" else "vorherigen Stichtag"
     print(f"Zeitverlauf für {nationality}:")
-    print("Jahr | Anzahl | Veränderung ggü. Vorjahr")
-    for year, total, d in zip(series.index, series.values, delta.values):
-        print(f"{int(year)} | {int(total)} | {int(d):+d}")
+    print(f"{period_name} | Anzahl | Veränderung ggü. {previous}")
+    for year, total, d in zip(years, totals, deltas):
+        print(f"{period_label(year)} | {int(total)} | {int(d):+d}")
 
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(10, 8), sharex=True)
 
     # Oben: absolute Anzahl
-    ax1.plot(series.index, series.values, marker="o")
+    ax1.plot(years, totals, marker="o")
     ax1.set_ylabel("Anzahl Personen")
-    title1 = f"{title_prefix} – {nationality}: Anzahl pro Jahr"
+    title1 = f"{title_prefix} – {nationality}: Anzahl pro {period_name}"
     ax1.set_title(title1)
     ax1.grid(True, linestyle=":", alpha=0.5)
 
     # Unten: jährliche Veränderung
-    colors = ["tab:green" if d >= 0 else "tab:red" for d in delta.values]
-    ax2.bar(series.index, delta.values, color=colors)
+    colors = ["tab:green" if d >= 0 else "tab:red" for d in deltas]
+    width = 0.8
+    if period_name != "Jahr" and len(years) > 1:
+        # Balkenbreite in Tagen statt in Jahren
+        width = 0.8 * np.diff(np.asarray(years, dtype="datetime64[D]")).min()
+    ax2.bar(years, deltas, color=colors, width=width)
     ax2.axhline(0, color="black", linewidth=0.8)
-    ax2.set_xlabel("Jahr")
-    ax2.set_ylabel("Veränderung zum Vorjahr")
-    title2 = f"Jährliche Veränderung ({nationality})"
+    ax2.set_xlabel(period_name)
+    ax2.set_ylabel(f"Veränderung zum {previous}")
+    if period_name == "Jahr":
+        title2 = f"Jährliche Veränderung ({nationality})"
+    else:
+        title2 = f"Veränderung zum {previous} ({nationality})"
     ax2.set_title(title2)
     ax2.grid(True, axis="y", linestyle=":", alpha=0.5)
 
@@ -321,41 +378,41 @@ def auto_plot_age(df: pd.DataFrame,
                   age_col: str,
                   count_col: str,
                   output_path: Path,
-                  title_prefix: str):
+                  title_prefix: str,
+                  period_name: str = "Jahr"):
     """Altersstruktur je Jahr als Diagramm zeichnen (mit feinen Gruppen & Farbverlauf)."""
 
-    # Alter numerisch
-    df[age_col] = pd.to_numeric(df[age_col], errors="coerce")
-    df = df.dropna(subset=[age_col])
-
-    # Altersgruppen bilden (0–5, 6–11, ..., 100+)
-    df["Altersgruppe"] = pd.cut(
-        df[age_col],
-        bins=AGE_BINS,
-        labels=AGE_LABELS,
-        right=True,
-        include_lowest=True,
-    )
-    df = df.dropna(subset=["Altersgruppe"])
+    # Alter numerisch -> Altersgruppen-Codes (0–5, 6–11, ..., 100+), -1 = ungültig
+    ages = pd.to_numeric(df[age_col], errors="coerce").to_numpy(dtype=np.float64)
+    group_codes = gk.bin_codes(ages, AGE_BINS)
+    valid = group_codes >= 0
 
-    years = sorted(df[year_col].unique())
+    year_codes, year_index = gk.factorize(df[year_col].to_numpy()[valid])
+    years = list(year_index.to_numpy())
     n_years = len(years)
-    print(f"Gefundene Jahre (Alter-Mode): {years}")
+    if period_name == "Jahr":
+        print(f"Gefundene Jahre (Alter-Mode): {years}")
+    else:
+        print(f"Gefundene Stichtage (Alter-Mode): {[period_label(y) for y in years]}")
+
+    # Matrix Jahr × Altersgruppe
+    matrix = gk.sum_matrix(
+        year_codes, n_years, group_codes[valid], len(AGE_LABELS),
+        df[count_col].to_numpy()[valid],
+    )
 
     # Gruppen in fixer Reihenfolge (nur die, die wirklich vorkommen)
-    groups_present = [
-        g for g in AGE_LABELS
-        if g in df["Altersgruppe"].unique()
-    ]
+    present = gk.present_matrix(year_codes, n_years, group_codes[valid], len(AGE_LABELS))
+    present_idx = np.flatnonzero(present.any(axis=0))
+    groups_present = [AGE_LABELS[i] for i in present_idx]
 
     # 1 Jahr -> Säulendiagramm der Altersgruppen
     if n_years == 1:
         year = years[0]
-        grouped = (
-            df.groupby("Altersgruppe")[count_col]
-            .sum()
-            .reindex(groups_present)
-            .fillna(0)
+        grouped = pd.Series(
+            matrix[0, present_idx],
+            index=pd.Index(groups_present, name="Altersgruppe"),
+            name=count_col,
         )
 
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -367,7 +424,7 @@ def auto_plot_age(df: pd.DataFrame,
         grouped.plot(kind="bar", ax=ax, color=colors)
         ax.set_xlabel("Altersgruppe")
         ax.set_ylabel("Anzahl Personen")
-        title = f"{title_prefix} – Altersstruktur {int(year)}"
+        title = f"{title_prefix} – Altersstruktur {period_label(year)}"
         ax.set_title(title)
         ax.grid(axis="y", linestyle=":", alpha=0.5)
 
@@ -380,31 +437,21 @@ def auto_plot_age(df: pd.DataFrame,
         return
 
     # Mehrere Jahre -> gestapeltes Flächendiagramm nach Altersgruppen
-    grouped = (
-        df.groupby([year_col, "Altersgruppe"])[count_col]
-        .sum()
-        .reset_index()
-    )
-
-    pivot = grouped.pivot(index=year_col, columns="Altersgruppe", values=count_col)
-    pivot = pivot.sort_index()
-    pivot = pivot[groups_present].fillna(0)
-
     fig, ax = plt.subplots(figsize=(12, 6))
 
     cmap = plt.get_cmap("viridis", len(groups_present))
     colors = [cmap(i) for i in range(len(groups_present))]
 
     ax.stackplot(
-        pivot.index.values,
-        [pivot[g].values for g in groups_present],
+        year_index.to_numpy(),
+        [matrix[:, i] for i in present_idx],
         labels=groups_present,
         colors=colors,
     )
 
-    ax.set_xlabel("Jahr")
+    ax.set_xlabel(period_name)
     ax.set_ylabel("Anzahl Personen")
-    title = f"{title_prefix} – Altersstruktur nach Jahr"
+    title = f"{title_prefix} – Altersstruktur nach {period_name}"
     ax.set_title(title)
     ax.legend(title="Altersgruppe", loc="upper left", ncol=2)
     ax.grid(True, axis="y", linestyle=":", alpha=0.5)
@@ -417,6 +464,51 @@ def auto_plot_age(df: pd.DataFrame,
     print(f"Gespeichert als: {output_path}")
 
 
+def default_output_path(input_path: Path, title_parts: list[str]) -> Path:
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    base_name = base_stem(input_path)
+    extra = "_".join(part.replace(" ", "_") for part in title_parts) or "gesamt"
+    return input_path.with_name(f"{base_name}_{extra}_{timestamp}.png")
+
+
+def preview(input_path: Path, args):
+    """--preview: Diagramm aus einer Stichprobe statt aus der ganzen Datei."""
+    import vorschau
+
+    if sqlite_store.is_database(input_path) or is_columnar(input_path):
+        raise SystemExit("--preview funktioniert nur mit CSV-Dateien (auch .gz/.zst).")
+    if args.nationality:
+        raise SystemExit("--preview kann nicht mit --nationality kombiniert werden.")
+
+    title_parts = []
+    if args.quartier:
+        title_parts.append(f"Wohnviertel {args.quartier}")
+    if args.jahr is not None:
+        title_parts.append(f"Jahr {args.jahr}")
+
+    von, bis = parse_bound(args.von), parse_bound(args.bis)
+    if von or bis:
+        title_parts.append(f"Stichtage {range_label(von, bis).replace('_', ' ')}")
+
+    sample = vorschau.sample_file(
+        input_path,
+        quartier=args.quartier,
+        jahr=args.jahr,
+        von=von,
+        bis=bis,
+        sample_size=args.preview_stichprobe,
+        time_budget=args.preview_sekunden,
+    )
+
+    if args.output:
+        output_path = Path(args.output)
+    else:
+        output_path = default_output_path(input_path, title_parts + ["vorschau"])
+
+    title_prefix = " – ".join(title_parts) if title_parts else "Gesamt"
+    vorschau.preview_plot(sample, output_path, title_prefix)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Automatisches Diagramm für BS-Demografie-Daten erzeugen."
@@ -449,13 +541,44 @@ def main():
         default=None,
     )
 
+    parser.add_argument(
+        "--von",
+        help="Nur Stichtage ab diesem Datum (z.B. '31. Dezember 2020' oder 2020-12-31)",
+        default=None,
+    )
+    parser.add_argument(
+        "--bis",
+        help="Nur Stichtage bis zu diesem Datum (einschliesslich)",
+        default=None,
+    )
+    parser.add_argument(
+        "--preview",
+        help="Schnelle Vorschau aus einer gewichteten Stichprobe (mit Fehlerbalken)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--preview-sekunden",
+        type=float,
+        help="Zeitbudget der Vorschau in Sekunden (Standard: 5)",
+        default=5.0,
+    )
+    parser.add_argument(
+        "--preview-stichprobe",
+        type=int,
+        help="Stichprobengrösse pro Jahr für die Vorschau (Standard: 2000)",
+        default=2000,
+    )
+
     args = parser.parse_args()
 
     input_path = Path(args.input_csv)
     if not input_path.exists():
         raise SystemExit(f"Datei nicht gefunden: {input_path}")
 
-    df = load_data(input_path)
+    if args.preview:
+        return preview(input_path, args)
+
+    df = load_data(input_path, args.quartier, args.jahr)
 
     # Spaltennamen raten
     quarter_col = guess_col(POSSIBLE_QUARTER_COLS, df.columns, "Wohnviertel-Name")
@@ -472,16 +595,20 @@ def main():
         df = df[df[year_col] == args.jahr]
         title_parts.append(f"Jahr {args.jahr}")
 
+    # Filtern nach Stichtag-Bereich (jeder Datum-Text wird nur einmal geparst)
+    von, bis = parse_bound(args.von), parse_bound(args.bis)
+    if von or bis:
+        date_col = guess_col(POSSIBLE_DATE_COLS, df.columns, "Datum")
+        df = df[date_mask(df[date_col], von, bis)]
+        title_parts.append(f"Stichtage {range_label(von, bis).replace('_', ' ')}")
+
     if df.empty:
         raise SystemExit("Nach dem Filtern sind keine Daten mehr vorhanden.")
 
     if args.output:
         output_path = Path(args.output)
     else:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-        base_name = input_path.stem
-        extra = "_".join(part.replace(" ", "_") for part in title_parts) or "gesamt"
-        output_path = input_path.with_name(f"{base_name}_{extra}_{timestamp}.png")
+        output_path = default_output_path(input_path, title_parts)
 
     title_prefix = " – ".join(title_parts) if title_parts else "Gesamt"
 
@@ -0,0 +1,296 @@
+import bz2
+import csv
+import gzip
+import io
+import lzma
+from contextlib import contextmanager
+from pathlib import Path
+
+# Gemeinsame Ein-/Ausgabe für filter.py, staatCounter.py und auto_plot_bs.py.
+# Komprimierte CSVs (.gz, .zst, .bz2, .xz) werden direkt als Stream gelesen,
+# ohne sie vorher auf die Platte zu entpacken.
+
+DELIMITER = ";"
+
+# Wie viele Zeilen gesammelt werden, bevor sie in einem Rutsch geschrieben werden
+WRITE_BATCH_ROWS = 10_000
+
+# Spalten, die in Parquet/Feather als Ganzzahl statt als Text landen
+INTEGER_COLUMNS = {"Anzahl", "Jahr"}
+
+COMPRESSED_SUFFIXES = {".gz", ".zst", ".bz2", ".xz"}
+COLUMNAR_SUFFIXES = {".parquet", ".feather"}
+
+# Ausgabeformate für filter.py -> Dateiendung
+OUTPUT_FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "csv.zst": ".csv.zst",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+
+
+def compression_of(path: Path) -> str | None:
+    """Kompressions-Endung einer Datei (z.B. '.gz') oder None."""
+    suffix = path.suffix.lower()
+    return suffix if suffix in COMPRESSED_SUFFIXES else None
+
+
+def base_stem(path: Path) -> str:
+    """Dateiname ohne Kompressions- und Formatendung ('x.csv.gz' -> 'x')."""
+    name = path.name
+    if compression_of(path):
+        name = name[: -len(path.suffix)]
+    return Path(name).stem
+
+
+def is_columnar(path: Path) -> bool:
+    return path.suffix.lower() in COLUMNAR_SUFFIXES
+
+
+def _open_binary(path: Path, mode: str, fileobj=None):
+    # fileobj: bereits geöffnete Rohdatei, aus der statt aus `path` gelesen wird
+    suffix = compression_of(path)
+    source = fileobj if fileobj is not None else path
+    if suffix == ".gz":
+        return gzip.open(source, mode)
+    if suffix == ".bz2":
+        return bz2.open(source, mode)
+    if suffix == ".xz":
+        return lzma.open(source, mode)
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit(
+                "Für .zst-Dateien wird das Paket 'zstandard' benötigt "
+                "(pip install zstandard)."
+            )
+        if "r" in mode:
+            return zstandard.ZstdDecompressor().stream_reader(
+                fileobj if fileobj is not None else path.open("rb"), closefd=True
+            )
+        return zstandard.ZstdCompressor().stream_writer(path.open("wb"), closefd=True)
+    return fileobj if fileobj is not None else path.open(mode)
+
+
+def open_text(path: Path, mode: str = "r"):
+    """Öffnet eine (evtl. komprimierte) Textdatei als Stream.
+
+    Beim Lesen wird 'utf-8-sig' verwendet, damit das BOM verschwindet.
+    """
+    path = Path(path)
+    binary_mode = "rb" if "r" in mode else ("ab" if "a" in mode else "wb")
+    encoding = "utf-8-sig" if "r" in mode else "utf-8"
+    raw = _open_binary(path, binary_mode)
+    return io.TextIOWrapper(raw, encoding=encoding, newline="")
+
+
+class _HashingFile(io.RawIOBase):
+    """Rohdatei, deren gelesene Bytes zusätzlich in `digest` landen."""
+
+    def __init__(self, path: Path, digest):
+        self._f = path.open("rb")
+        self.digest = digest
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        n = self._f.readinto(buffer)
+        if n:
+            self.digest.update(memoryview(buffer)[:n])
+        return n
+
+    def drain(self):
+        # Was der Entpacker nicht mehr gelesen hat (z.B. nach dem letzten Frame)
+        for chunk in iter(lambda: self._f.read(1 << 20), b""):
+            self.digest.update(chunk)
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+@contextmanager
+def open_hashed(path: Path, digest):
+    """Wie open_text (lesen), dabei wird der Inhalt der Datei in `digest` gehasht.
+
+    So braucht es für Inhalts-Hash und Auswertung nur einen Durchgang über die
+    Datei. Der Hash ist erst nach vollständigem Lesen gültig; wer vorher abbricht,
+    darf ihn nicht verwenden.
+    """
+    path = Path(path)
+    source = _HashingFile(path, digest)
+    try:
+        raw = _open_binary(path, "rb", io.BufferedReader(source))
+        with io.TextIOWrapper(raw, encoding="utf-8-sig", newline="") as f_in:
+            yield f_in
+            source.drain()
+    finally:
+        source.close()
+
+
+def open_reader(f_in, delimiter: str = DELIMITER) -> csv.DictReader:
+    return csv.DictReader(f_in, delimiter=delimiter)
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise SystemExit(
+            "Für Parquet/Feather wird das Paket 'pyarrow' benötigt (pip install pyarrow)."
+        )
+    return pyarrow
+
+
+def _to_int(raw) -> int | None:
+    # 1'234 -> 1234, leer/ungültig -> None (fehlender Wert)
+    raw = (raw or "").strip().replace("'", "").replace(" ", "")
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+class RowWriter:
+    """Schreibt Zeilen (dicts) gebündelt als CSV, komprimierte CSV, Parquet oder Feather.
+
+    Zeilen werden gesammelt und blockweise geschrieben statt einzeln.
+    Bei Parquet/Feather werden die Text-Spalten als Dictionary kodiert –
+    die Exporte bestehen fast nur aus wenigen, oft wiederholten Werten –,
+    Anzahl und Jahr als Ganzzahlen. Feather wird blockweise geschrieben: jede
+    Spalte hat ein Dictionary, das über alle Blöcke nur wächst, spätere Blöcke
+    schreiben nur die neuen Einträge (Dictionary-Deltas).
+    """
+
+    def __init__(self, output_path: Path, fieldnames, batch_rows: int = WRITE_BATCH_ROWS):
+        self.output_path = Path(output_path)
+        self.fieldnames = list(fieldnames)
+        self.batch_rows = batch_rows
+        self._buffer = []
+        self._format = self.output_path.suffix.lower()
+
+        self._f_out = None
+        self._csv_writer = None
+        self._pq_writer = None
+        self._ipc_writer = None
+        # Feather: pro Text-Spalte Wert -> Index und die Werte in Index-Reihenfolge
+        self._dict_index = {name: {} for name in self.fieldnames}
+        self._dict_values = {name: [] for name in self.fieldnames}
+
+        if self._format == ".parquet" or self._format == ".feather":
+            self._pa = _require_pyarrow()
+        else:
+            self._f_out = open_text(self.output_path, "w")
+            self._csv_writer = csv.writer(self._f_out, delimiter=DELIMITER)
+            self._csv_writer.writerow(self.fieldnames)
+
+    def write(self, row: dict):
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def _schema(self):
+        pa = self._pa
+        return pa.schema([
+            pa.field(name, pa.int64()) if name in INTEGER_COLUMNS
+            else pa.field(name, pa.dictionary(pa.int32(), pa.string()))
+            for name in self.fieldnames
+        ])
+
+    def _table(self, rows):
+        pa = self._pa
+        arrays = [
+            pa.array([_to_int(row.get(name)) for row in rows], type=pa.int64())
+            if name in INTEGER_COLUMNS
+            else pa.array([row.get(name) for row in rows], type=pa.string())
+            .dictionary_encode().cast(pa.dictionary(pa.int32(), pa.string()))
+            for name in self.fieldnames
+        ]
+        return pa.Table.from_arrays(arrays, schema=self._schema())
+
+    def _dictionary_array(self, name: str, rows):
+        pa = self._pa
+        index = self._dict_index[name]
+        values = self._dict_values[name]
+        codes = []
+        for row in rows:
+            value = row.get(name)
+            if value is None:
+                codes.append(None)
+                continue
+            code = index.get(value)
+            if code is None:
+                code = index[value] = len(values)
+                values.append(value)
+            codes.append(code)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(codes, type=pa.int32()), pa.array(values, type=pa.string())
+        )
+
+    def _batch(self, rows):
+        pa = self._pa
+        arrays = [
+            pa.array([_to_int(row.get(name)) for row in rows], type=pa.int64())
+            if name in INTEGER_COLUMNS
+            else self._dictionary_array(name, rows)
+            for name in self.fieldnames
+        ]
+        return pa.record_batch(arrays, schema=self._schema())
+
+    def _open_ipc(self):
+        pa = self._pa
+        # lz4 wie bei feather.write_feather (falls vorhanden)
+        compression = "lz4" if pa.Codec.is_available("lz4") else None
+        options = pa.ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True)
+        self._ipc_writer = pa.ipc.new_file(str(self.output_path), self._schema(), options=options)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows = self._buffer
+        self._buffer = []
+
+        if self._csv_writer is not None:
+            self._csv_writer.writerows(
+                [row.get(name, "") for name in self.fieldnames] for row in rows
+            )
+        elif self._format == ".parquet":
+            import pyarrow.parquet as pq
+            table = self._table(rows)
+            if self._pq_writer is None:
+                self._pq_writer = pq.ParquetWriter(str(self.output_path), table.schema)
+            self._pq_writer.write_table(table)
+        else:
+            # Feather (Arrow IPC): Block sofort schreiben, nichts bleibt im Speicher
+            if self._ipc_writer is None:
+                self._open_ipc()
+            self._ipc_writer.write_batch(self._batch(rows))
+
+    def close(self):
+        self.flush()
+        if self._f_out is not None:
+            self._f_out.close()
+        elif self._format == ".parquet":
+            if self._pq_writer is None:
+                import pyarrow.parquet as pq
+                pq.write_table(self._table([]), str(self.output_path))
+            else:
+                self._pq_writer.close()
+        else:
+            if self._ipc_writer is None:
+                self._open_ipc()
+            self._ipc_writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
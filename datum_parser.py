@@ -0,0 +1,104 @@
+import re
+from datetime import date
+from functools import lru_cache
+
+# Parser für deutsche Datumsangaben wie "31. Dezember 2023" aus der Datum-Spalte.
+# Die Exporte enthalten über Millionen Zeilen nur eine Handvoll verschiedener
+# Stichtage – jeder Text wird deshalb nur einmal geparst (lru_cache bzw. einmal
+# pro eindeutigem Wert in der pandas-Spalte).
+
+DATE_COLUMN = "Datum"
+
+GERMAN_MONTHS = {
+    "januar": 1, "jan": 1, "jänner": 1,
+    "februar": 2, "feb": 2,
+    "märz": 3, "maerz": 3, "mär": 3, "mrz": 3,
+    "april": 4, "apr": 4,
+    "mai": 5,
+    "juni": 6, "jun": 6,
+    "juli": 7, "jul": 7,
+    "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9,
+    "oktober": 10, "okt": 10,
+    "november": 11, "nov": 11,
+    "dezember": 12, "dez": 12,
+}
+
+_GERMAN_RE = re.compile(r"^(\d{1,2})\.?\s+([A-Za-zÄÖÜäöü]+)\.?\s+(\d{4})$")
+_DOTTED_RE = re.compile(r"^(\d{1,2})\.(\d{1,2})\.(\d{4})$")
+_ISO_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+
+
+@lru_cache(maxsize=None)
+def parse_datum(text: str) -> date | None:
+    """'31. Dezember 2023', '31.12.2023' oder '2023-12-31' -> date, sonst None."""
+    text = (text or "").strip()
+
+    match = _GERMAN_RE.match(text)
+    if match:
+        month = GERMAN_MONTHS.get(match.group(2).lower())
+        if month is None:
+            return None
+        day, year = int(match.group(1)), int(match.group(3))
+    elif (match := _DOTTED_RE.match(text)):
+        day, month, year = (int(g) for g in match.groups())
+    elif (match := _ISO_RE.match(text)):
+        year, month, day = (int(g) for g in match.groups())
+    else:
+        return None
+
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def parse_bound(text: str | None) -> date | None:
+    """Grenze für --von/--bis; ungültige Angaben brechen mit Meldung ab."""
+    if text is None:
+        return None
+    parsed = parse_datum(text)
+    if parsed is None:
+        raise SystemExit(
+            f"Ungültiges Datum '{text}'. Erlaubt: '31. Dezember 2023', '31.12.2023', '2023-12-31'."
+        )
+    return parsed
+
+
+def range_label(von: date | None, bis: date | None) -> str:
+    """Kurzbezeichnung für Dateinamen und Log, z.B. '2020-12-31_bis_2023-12-31'."""
+    if von and bis:
+        return f"{von.isoformat()}_bis_{bis.isoformat()}"
+    if von:
+        return f"ab_{von.isoformat()}"
+    return f"bis_{bis.isoformat()}"
+
+
+def in_range(text: str, von: date | None, bis: date | None) -> bool:
+    """Für den Streaming-Pfad: liegt der Datum-Text im Bereich [von, bis]?"""
+    parsed = parse_datum(text)
+    if parsed is None:
+        return False
+    return (von is None or parsed >= von) and (bis is None or parsed <= bis)
+
+
+def date_mask(values, von: date | None, bis: date | None):
+    """Für den pandas-Pfad: boolesche Maske, jeder eindeutige Text wird einmal geparst."""
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+    ok = np.array([in_range(str(text), von, bis) for text in uniques], dtype=bool)
+    # Code -1 (leer/NaN) liegt nie im Bereich
+    return np.append(ok, False)[codes]
+
+
+def parse_dates(values):
+    """Für den pandas-Pfad: Datum-Texte -> datetime64 (NaT falls ungültig),
+    jeder eindeutige Text wird einmal geparst."""
+    import pandas as pd
+
+    codes, uniques = pd.factorize(values)
+    parsed = pd.to_datetime([parse_datum(str(text)) for text in uniques] + [None])
+    # Code -1 (leer/NaN) -> das angehängte NaT
+    return pd.Series(parsed[codes], index=getattr(values, "index", None))
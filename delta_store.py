@@ -0,0 +1,267 @@
+import argparse
+import gzip
+import json
+from collections import defaultdict
+from pathlib import Path
+
+from csv_io import RowWriter, open_reader, open_text
+from filter import parse_count
+
+# Kompakter Speicher für die Jahres-Stichtage des 100126-Exports.
+# Von Jahr zu Jahr ändert sich nur ein kleiner Teil der Zeilen. Gespeichert wird
+# deshalb ein Basisjahr vollständig und für jedes weitere Jahr nur die Änderungen
+# (Schlüssel -> Veränderung der Anzahl, neue und weggefallene Schlüssel; bei
+# weggefallenen wird die bisherige Anzahl als negative Veränderung mitgespeichert).
+# Schlüsselwerte werden als Zahlen in Wörterbücher pro Spalte kodiert.
+#
+# python delta_store.py bauen bs.delta.json.gz 100126.csv
+# python delta_store.py jahr bs.delta.json.gz 2023 --output 100126_2023.csv
+# python delta_store.py trend bs.delta.json.gz --nationality Ukraine --plot ukraine.png
+
+DELIMITER = ";"
+
+YEAR_COLUMN = "Jahr"
+DATE_COLUMN = "Datum"
+COUNT_COLUMN = "Anzahl"
+NAT_COLUMN = "Staatsangehoerigkeit"
+QUARTER_COLUMN = "Wohnviertel-Name"
+
+# Spalten, die nicht zum Schlüssel gehören (alle anderen schon)
+NON_KEY_COLUMNS = {YEAR_COLUMN, DATE_COLUMN, COUNT_COLUMN}
+
+
+def _year_of(row: dict) -> int | None:
+    for raw in ((row.get(YEAR_COLUMN) or "").strip(), (row.get(DATE_COLUMN) or "").strip()[-4:]):
+        if raw.isdigit():
+            return int(raw)
+    return None
+
+
+def build_store(output_file: str, input_files: list[str]) -> dict:
+    """Liest die Exporte und schreibt Basisjahr + Jahres-Deltas."""
+    columns = None
+    key_columns = None
+    dictionaries = None
+    codes = None
+    snapshots = defaultdict(lambda: defaultdict(int))
+    dates = {}
+
+    for input_file in input_files:
+        with open_text(Path(input_file)) as f_in:
+            reader = open_reader(f_in, DELIMITER)
+            if columns is None:
+                columns = reader.fieldnames
+                key_columns = [c for c in columns if c not in NON_KEY_COLUMNS]
+                dictionaries = [[] for _ in key_columns]
+                codes = [{} for _ in key_columns]
+            if COUNT_COLUMN not in reader.fieldnames:
+                raise SystemExit(
+                    f"Spalte '{COUNT_COLUMN}' nicht gefunden. "
+                    f"Verfügbare Spalten: {reader.fieldnames}"
+                )
+
+            for row in reader:
+                year = _year_of(row)
+                if year is None:
+                    continue
+                datum = (row.get(DATE_COLUMN) or "").strip()
+                known = dates.setdefault(year, datum)
+                if known != datum:
+                    # Der Speicher hat einen Stand pro Jahr – zwei Stichtage würden addiert
+                    raise SystemExit(
+                        f"Jahr {year} hat mehrere Stichtage ('{known}' und '{datum}'). "
+                        f"Bitte vorher auf einen Stichtag pro Jahr filtern "
+                        f"(z.B. filter.py --von/--bis)."
+                    )
+
+                key = []
+                for i, col in enumerate(key_columns):
+                    value = (row.get(col) or "").strip()
+                    code = codes[i].get(value)
+                    if code is None:
+                        code = codes[i][value] = len(dictionaries[i])
+                        dictionaries[i].append(value)
+                    key.append(code)
+                snapshots[year][tuple(key)] += parse_count(row.get(COUNT_COLUMN))
+
+    if not snapshots:
+        raise SystemExit("Keine gültigen Jahreswerte gefunden.")
+
+    years = sorted(snapshots)
+    base = snapshots[years[0]]
+    deltas = {}
+    previous = base
+    for year in years[1:]:
+        current = snapshots[year]
+        changes = [
+            list(key) + [anzahl - previous.get(key, 0)]
+            for key, anzahl in current.items()
+            if key not in previous or anzahl != previous[key]
+        ]
+        removed = [list(key) + [-previous[key]] for key in previous if key not in current]
+        deltas[str(year)] = {"aenderungen": changes, "entfernt": removed}
+        previous = current
+
+    store = {
+        "spalten": columns,
+        "schluessel": key_columns,
+        "werte": dictionaries,
+        "jahre": years,
+        "daten": {str(y): dates[y] for y in years},
+        "basis": [list(key) + [anzahl] for key, anzahl in base.items()],
+        "deltas": deltas,
+    }
+
+    # Kontrolle: die nur aus den Deltas gerechneten Summen müssen den Jahressummen
+    # der Exporte entsprechen
+    expected = [(year, sum(snapshots[year].values())) for year in years]
+    actual = [(year, total) for year, total, _ in trend(store)]
+    if actual != expected:
+        wrong = [(e, a) for e, a in zip(expected, actual) if e != a]
+        raise SystemExit(f"Deltas stimmen nicht mit den Exporten überein: {wrong[:5]}")
+
+    with gzip.open(output_file, "wt", encoding="utf-8") as f_out:
+        json.dump(store, f_out, ensure_ascii=False, separators=(",", ":"))
+
+    n_changes = sum(len(d["aenderungen"]) + len(d["entfernt"]) for d in deltas.values())
+    n_full = sum(len(s) for s in snapshots.values())
+    print(
+        f"{len(years)} Jahre gespeichert: Basis {years[0]} mit {len(base)} Zeilen, "
+        f"{n_changes} Änderungen statt {n_full} Zeilen."
+    )
+    print(f"Gespeichert in: {output_file}")
+    return store
+
+
+def load_store(store_file: str) -> dict:
+    with gzip.open(store_file, "rt", encoding="utf-8") as f_in:
+        return json.load(f_in)
+
+
+def snapshot(store: dict, year: int) -> dict:
+    """Baut den Bestand eines Jahres auf: Schlüssel-Tupel -> Anzahl."""
+    if year not in store["jahre"]:
+        raise SystemExit(f"Jahr {year} nicht im Speicher. Vorhanden: {store['jahre']}")
+
+    current = {tuple(entry[:-1]): entry[-1] for entry in store["basis"]}
+    for y in store["jahre"][1:]:
+        if y > year:
+            break
+        delta = store["deltas"][str(y)]
+        for entry in delta["aenderungen"]:
+            key = tuple(entry[:-1])
+            current[key] = current.get(key, 0) + entry[-1]
+        for entry in delta["entfernt"]:
+            current.pop(tuple(entry[:-1]), None)
+    return current
+
+
+def _matcher(store: dict, conditions: dict):
+    """Prüfung Schlüssel-Tupel -> passt zu {Spalte: Wert}? (auf den Codes)"""
+    checks = []
+    for column, value in conditions.items():
+        if value is None:
+            continue
+        if column not in store["schluessel"]:
+            raise SystemExit(
+                f"Spalte '{column}' nicht im Schlüssel. Vorhanden: {store['schluessel']}"
+            )
+        i = store["schluessel"].index(column)
+        values = store["werte"][i]
+        code = values.index(value) if value in values else -1
+        checks.append((i, code))
+    return lambda key: all(key[i] == code for i, code in checks)
+
+
+def year_change(store: dict, year: int, conditions: dict | None = None) -> int:
+    """Veränderung zum Vorjahr, nur aus dem Delta des Jahres berechnet
+    (geänderte/neue Schlüssel plus die Anzahl der weggefallenen, negativ)."""
+    if year == store["jahre"][0]:
+        return 0
+    matches = _matcher(store, conditions or {})
+    delta = store["deltas"][str(year)]
+    return sum(
+        entry[-1] for entry in delta["aenderungen"] + delta["entfernt"]
+        if matches(entry[:-1])
+    )
+
+
+def trend(store: dict, conditions: dict | None = None) -> list[tuple[int, int, int]]:
+    """(Jahr, Anzahl, Veränderung) für alle Jahre – Basis einmal, danach nur Deltas."""
+    matches = _matcher(store, conditions or {})
+    total = sum(entry[-1] for entry in store["basis"] if matches(entry[:-1]))
+    result = [(store["jahre"][0], total, 0)]
+    for year in store["jahre"][1:]:
+        change = year_change(store, year, conditions)
+        total += change
+        result.append((year, total, change))
+    return result
+
+
+def write_year(store: dict, year: int, output_file: str):
+    """Schreibt den rekonstruierten Export eines Jahres (gleiches Schema wie 100126)."""
+    key_columns = store["schluessel"]
+    values = store["werte"]
+    with RowWriter(Path(output_file), store["spalten"]) as writer:
+        for key, anzahl in snapshot(store, year).items():
+            row = {col: values[i][code] for i, (col, code) in enumerate(zip(key_columns, key))}
+            row[DATE_COLUMN] = store["daten"][str(year)]
+            row[YEAR_COLUMN] = str(year)
+            row[COUNT_COLUMN] = str(anzahl)
+            writer.write(row)
+    print(f"Bestand {year} gespeichert in: {output_file}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jahres-Stichtage als Basis + Deltas speichern.")
+    sub = parser.add_subparsers(dest="befehl", required=True)
+
+    p_build = sub.add_parser("bauen", help="Speicher aus CSV-Exporten bauen")
+    p_build.add_argument("store", help="Ausgabe, z.B. bs.delta.json.gz")
+    p_build.add_argument("input_csv", nargs="+")
+
+    p_year = sub.add_parser("jahr", help="Bestand eines Jahres als CSV rekonstruieren")
+    p_year.add_argument("store")
+    p_year.add_argument("jahr", type=int)
+    p_year.add_argument("--output", default=None, help="Standard: <store>_<jahr>.csv")
+
+    p_trend = sub.add_parser("trend", help="Anzahl und Veränderung pro Jahr")
+    p_trend.add_argument("store")
+    p_trend.add_argument("--nationality", default=None, help="z.B. 'Ukraine'")
+    p_trend.add_argument("--quartier", default=None, help="Wohnviertel-Name, z.B. 'Matthäus'")
+    p_trend.add_argument("--plot", default=None, metavar="DATEI", help="Diagramm speichern (PNG)")
+
+    args = parser.parse_args()
+
+    if args.befehl == "bauen":
+        build_store(args.store, args.input_csv)
+        return
+
+    store = load_store(args.store)
+
+    if args.befehl == "jahr":
+        store_path = Path(args.store)
+        output_file = args.output or store_path.with_name(
+            f"{store_path.name.split('.')[0]}_{args.jahr}.csv"
+        )
+        write_year(store, args.jahr, output_file)
+        return
+
+    conditions = {NAT_COLUMN: args.nationality, QUARTER_COLUMN: args.quartier}
+    rows = trend(store, conditions)
+    if args.plot:
+        from auto_plot_bs import plot_trend
+
+        title_prefix = f"Wohnviertel {args.quartier}" if args.quartier else "Gesamt"
+        years, totals, changes = zip(*rows)
+        plot_trend(years, totals, changes, args.nationality or "Alle",
+                   Path(args.plot), title_prefix)
+        return
+
+    print("Jahr | Anzahl | Veränderung ggü. Vorjahr")
+    for year, total, change in rows:
+        print(f"{year} | {total} | {change:+d}")
+
+
+if __name__ == "__main__":
+    main()
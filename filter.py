@@ -1,89 +1,237 @@
-import csv
+import argparse
 import sys
 from pathlib import Path
 from datetime import datetime
 
+from csv_io import OUTPUT_FORMATS, RowWriter, base_stem, open_hashed, open_reader, open_text
+from datum_parser import DATE_COLUMN, in_range, parse_bound, range_label
+import filter_cache
+import sqlite_store
+
 DELIMITER = ";"
 
 
 COUNT_COLUMN = "Anzahl"
 
-#Filtert daten für die IDPA arbeit. Befehl zum adden filtern: 
-#python filter.py [csv file Name] "Spalte" "Wert"
-#z.B. python filter.py 100126_Wohnviertel-Name_Matthäus1919.csv "Datum" "31. Dezember 2023"
-def filter_rows(input_file: str, filter_column: str, filter_value: str):
-    input_path = Path(input_file)
+def parse_count(raw_count: str) -> int:
+    """Wert aus der Anzahl-Spalte als int (1'234 -> 1234, leer/ungültig -> 0)."""
+    raw_count = (raw_count or "").strip()
+    if not raw_count:
+        return 0
+    try:
+        raw_count_clean = raw_count.replace("'", "").replace(" ", "")
+        return int(raw_count_clean)
+    except ValueError:
+        return 0
+
+
+def filtered_path(input_path: Path, filter_column: str, filter_value: str,
+                  timestamp_for_filename: str, output_format: str = "csv") -> Path:
+    """Pfad der gefilterten Datei, z.B. 100126_Wohnviertel-Name_Matthäus1919.csv"""
+    safe_col = filter_column.replace(" ", "_")
+    safe_val = filter_value.replace(" ", "_")
 
+    extension = OUTPUT_FORMATS[output_format]
+    output_name = (
+        f"{base_stem(input_path)}_{safe_col}_{safe_val}{timestamp_for_filename}{extension}"
+    )
+    return input_path.with_name(output_name)
 
-    now = datetime.now()
-    timestamp_for_filename = now.strftime("%H%M")
-    timestamp_for_log = now.strftime("%Y-%m-%d %H:%M")
 
+def append_count_log(count_log_path: Path, timestamp_for_log: str, file_name: str,
+                     filter_column: str, filter_value: str, total_personen: int,
+                     date_range: str | None = None):
+    zeitraum = f"Zeitraum={date_range} | " if date_range else ""
+    with count_log_path.open(mode="a", encoding="utf-8") as log:
+        log.write(
+            f"{timestamp_for_log} | Datei={file_name} | "
+            f"Filterspalte={filter_column} | Wert={filter_value} | {zeitraum}"
+            f"Personen={total_personen}\n"
+        )
 
-    safe_col = filter_column.replace(" ", "_")
-    safe_val = filter_value.replace(" ", "_")
 
+def check_columns(fieldnames, *filter_columns: str):
+    for filter_column in filter_columns:
+        if filter_column not in fieldnames:
+            print(f"Fehler: Spalte '{filter_column}' nicht gefunden.")
+            print(f"Verfügbare Spalten: {fieldnames}")
+            sys.exit(1)
 
-    output_name = f"{input_path.stem}_{safe_col}_{safe_val}{timestamp_for_filename}.csv"
-    output_path = input_path.with_name(output_name)
+    if COUNT_COLUMN not in fieldnames:
+        print(f"Fehler: Spalte '{COUNT_COLUMN}' (Personenzahl) nicht gefunden.")
+        print(f"Verfügbare Spalten: {fieldnames}")
+        sys.exit(1)
 
 
-    count_log_path = input_path.with_name("Anzahl.txt")
+def row_matcher(filter_column: str | None = None, filter_value: str | None = None,
+                von=None, bis=None):
+    """Bedingung für eine Zeile: Spalte == Wert und/oder Datum im Bereich [von, bis]."""
+    def matches(row: dict) -> bool:
+        if filter_column and (row.get(filter_column) or "").strip() != filter_value:
+            return False
+        if (von or bis) and not in_range(row.get(DATE_COLUMN), von, bis):
+            return False
+        return True
+    return matches
+
 
+def _write_filtered(rows, fieldnames, output_path: Path, matches) -> int:
     total_personen = 0
+    with RowWriter(output_path, fieldnames) as writer:
+        for row in rows:
+            if matches(row):
+                writer.write(row)
+                total_personen += parse_count(row.get(COUNT_COLUMN))
+    return total_personen
 
 
-    with input_path.open(mode="r", encoding="utf-8-sig", newline="") as f_in, \
-         output_path.open(mode="w", encoding="utf-8", newline="") as f_out:
+#Filtert daten für die IDPA arbeit. Befehl zum adden filtern: 
+#python filter.py [csv file Name] "Spalte" "Wert"
+#z.B. python filter.py 100126_Wohnviertel-Name_Matthäus1919.csv "Datum" "31. Dezember 2023"
+#Komprimierte Eingaben (.csv.gz, .csv.zst, ...) werden direkt gelesen,
+#mit --format csv.gz / csv.zst / parquet / feather wird entsprechend geschrieben.
+#Statt einer CSV geht auch eine Datenbank aus sqlite_store.py (bs.db).
+#Gleiche Anfrage auf gleichem Dateiinhalt -> Ergebnis aus filter_cache.py.
+#Stichtag-Bereich: python filter.py 100126.csv --von "31. Dezember 2020" --bis 2023-12-31
+def filter_rows(input_file: str, filter_column: str | None = None,
+                filter_value: str | None = None,
+                output_format: str = "csv", use_cache: bool = True,
+                von=None, bis=None):
+    input_path = Path(input_file)
+
+    date_range = range_label(von, bis) if (von or bis) else None
+    if filter_column is None and date_range is None:
+        print("Fehler: Spalte und Wert oder --von/--bis angeben.")
+        sys.exit(1)
 
-        reader = csv.DictReader(f_in, delimiter=DELIMITER)
+    # Ohne Spaltenfilter heisst die Ausgabe nach dem Zeitraum (..._Datum_2020-12-31_bis_...)
+    if filter_column is None:
+        name_column, name_value = DATE_COLUMN, date_range
+        log_column, log_value, log_range = DATE_COLUMN, date_range, None
+    else:
+        name_column = filter_column
+        name_value = f"{filter_value}_{date_range}" if date_range else filter_value
+        log_column, log_value, log_range = filter_column, filter_value, date_range
 
-        if filter_column not in reader.fieldnames:
-            print(f"Fehler: Spalte '{filter_column}' nicht gefunden.")
-            print(f"Verfügbare Spalten: {reader.fieldnames}")
-            sys.exit(1)
 
-        if COUNT_COLUMN not in reader.fieldnames:
-            print(f"Fehler: Spalte '{COUNT_COLUMN}' (Personenzahl) nicht gefunden.")
-            print(f"Verfügbare Spalten: {reader.fieldnames}")
-            sys.exit(1)
+    now = datetime.now()
+    timestamp_for_filename = now.strftime("%H%M")
+    timestamp_for_log = now.strftime("%Y-%m-%d %H:%M")
 
-        writer = csv.DictWriter(f_out, fieldnames=reader.fieldnames, delimiter=DELIMITER)
-        writer.writeheader()
 
-        for row in reader:
-            if (row.get(filter_column) or "").strip() == filter_value:
-                writer.writerow(row)
+    count_log_path = input_path.with_name("Anzahl.txt")
 
-                raw_count = (row.get(COUNT_COLUMN) or "").strip()
-                if raw_count:
-                    try:
-                        raw_count_clean = raw_count.replace("'", "").replace(" ", "")
-                        anzahl = int(raw_count_clean)
-                    except ValueError:
-                        anzahl = 0
-                    total_personen += anzahl
+    is_database = sqlite_store.is_database(input_path)
+    # Stempel vor dem Lesen nehmen, damit eine währenddessen geänderte Datei
+    # beim nächsten Mal nicht als bekannt gilt
+    stamp = filter_cache.file_stamp(input_path) if use_cache else None
 
-    with count_log_path.open(mode="a", encoding="utf-8") as log:
-        log.write(
-            f"{timestamp_for_log} | Datei={input_path.name} | "
-            f"Filterspalte={filter_column} | Wert={filter_value} | "
-            f"Personen={total_personen}\n"
+    if use_cache:
+        # Eine neue CSV wird nicht extra gehasht – das passiert unten beim Filtern
+        cached = filter_cache.lookup(
+            input_path, log_column, log_value, output_format, log_range or "",
+            read_file=is_database,
+        )
+        if cached is not None:
+            output_path = input_path.with_name(cached["ausgabe"])
+            total_personen = cached["personen"]
+            append_count_log(
+                count_log_path, timestamp_for_log, input_path.name,
+                log_column, log_value, total_personen, log_range,
+            )
+            print(f"Gleiche Filterung bereits vorhanden (Cache): {output_path}")
+            print(f"Gesamtzahl Personen (Summe aus '{COUNT_COLUMN}'): {total_personen}")
+            print(f"Eintrag in {count_log_path.name} hinzugefügt.")
+            return output_path, total_personen
+
+
+    output_path = filtered_path(
+        input_path, name_column, name_value, timestamp_for_filename, output_format
+    )
+
+    matches = row_matcher(filter_column, filter_value, von, bis)
+    needed_columns = [c for c in (filter_column, date_range and DATE_COLUMN) if c]
+
+    digest = None
+    if is_database:
+        # Datenbank aus sqlite_store.py: Filter läuft als indizierte Abfrage
+        fieldnames = list(sqlite_store.EXPORT_COLUMNS)
+        check_columns(fieldnames, *needed_columns)
+        conditions = {filter_column: filter_value} if filter_column else {}
+        if date_range and filter_column != DATE_COLUMN:
+            # Stichtag-Bereich als Liste der passenden Datum-Werte mitabfragen
+            conditions[DATE_COLUMN] = sqlite_store.datum_texts(input_path, von, bis)
+        rows = sqlite_store.iter_rows(input_path, conditions)
+        total_personen = _write_filtered(rows, fieldnames, output_path, matches)
+    else:
+        if use_cache:
+            # Inhalts-Hash für den Cache im selben Durchgang wie das Filtern
+            digest = filter_cache.new_digest()
+            source = open_hashed(input_path, digest)
+        else:
+            source = open_text(input_path)
+        with source as f_in:
+
+            reader = open_reader(f_in, DELIMITER)
+            check_columns(reader.fieldnames, *needed_columns)
+            total_personen = _write_filtered(reader, reader.fieldnames, output_path, matches)
+
+    append_count_log(
+        count_log_path, timestamp_for_log, input_path.name,
+        log_column, log_value, total_personen, log_range,
+    )
+
+    if use_cache:
+        filter_cache.store(
+            input_path, log_column, log_value, output_format,
+            output_path, total_personen, log_range or "",
+            content_hash=digest.hexdigest() if digest is not None else None,
+            stamp=stamp,
         )
 
     print(f"Gefilterte Daten gespeichert in: {output_path}")
     print(f"Gesamtzahl Personen (Summe aus '{COUNT_COLUMN}'): {total_personen}")
     print(f"Eintrag in {count_log_path.name} hinzugefügt.")
+    return output_path, total_personen
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 4:
-        print("Usage: python matfilter.py <input.csv> <Spaltenname> <Filterwert>")
-        print('Beispiel: python matfilter.py 100126.csv "Wohnviertel-Name" "Matthäus"')
-        sys.exit(1)
-
-    input_file = sys.argv[1]
-    filter_column = sys.argv[2]
-    filter_value = sys.argv[3]
-
-    filter_rows(input_file, filter_column, filter_value)
+    parser = argparse.ArgumentParser(
+        description="CSV-Export nach Spaltenwert und/oder Stichtag-Bereich filtern.",
+        epilog='Beispiel: python filter.py 100126.csv "Wohnviertel-Name" "Matthäus"',
+    )
+    parser.add_argument("input_file")
+    parser.add_argument("filter_column", nargs="?", default=None)
+    parser.add_argument("filter_value", nargs="?", default=None)
+    parser.add_argument(
+        "--von",
+        help="Nur Stichtage ab diesem Datum (z.B. '31. Dezember 2020' oder 2020-12-31)",
+        default=None,
+    )
+    parser.add_argument(
+        "--bis",
+        help="Nur Stichtage bis zu diesem Datum (einschliesslich)",
+        default=None,
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(OUTPUT_FORMATS),
+        default="csv",
+        help="Ausgabeformat (Standard: csv)",
+    )
+    parser.add_argument(
+        "--ohne-cache",
+        help="Immer neu filtern, auch wenn das Ergebnis schon vorhanden ist",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    if (args.filter_column is None) != (args.filter_value is None):
+        parser.error("Spalte und Wert müssen zusammen angegeben werden.")
+
+    filter_rows(
+        args.input_file, args.filter_column, args.filter_value, args.format,
+        use_cache=not args.ohne_cache,
+        von=parse_bound(args.von),
+        bis=parse_bound(args.bis),
+    )
@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+
+# Cache für filter.py: gleiche Datei (gleicher Inhalt) + gleiche Spalte + gleicher
+# Wert -> die bereits geschriebene Ausgabedatei und Personenzahl wiederverwenden,
+# statt die Datei nochmals zu scannen und eine identische Kopie zu schreiben.
+# Der Index liegt als .filter_cache.json im Ordner der Eingabedatei (neben Anzahl.txt).
+# Den Inhalts-Hash einer neuen/geänderten Datei berechnet filter.py im selben
+# Durchgang wie das Filtern (csv_io.open_hashed), nicht in einem eigenen Lesedurchgang.
+#
+# python filter_cache.py liste [ordner]
+# python filter_cache.py leeren [ordner] [--dateien]
+
+CACHE_NAME = ".filter_cache.json"
+
+# Höchstens so viele Einträge pro Ordner (Anzahl, nicht Bytes). Die am längsten
+# nicht benutzten fliegen aus dem Index; ihre Ausgabedateien bleiben liegen (sie
+# können Arbeitsdaten oder Eingabe einer weiteren Filterung sein) und werden erst
+# mit "leeren --dateien" gelöscht.
+MAX_ENTRIES = 100
+
+
+def cache_path(directory: Path) -> Path:
+    return Path(directory) / CACHE_NAME
+
+
+def load_index(directory: Path) -> dict:
+    path = cache_path(directory)
+    if not path.exists():
+        return {"eintraege": {}, "fingerprints": {}}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index(directory: Path, index: dict):
+    path = cache_path(directory)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    tmp_path.replace(path)
+
+
+def new_digest():
+    return hashlib.blake2b(digest_size=16)
+
+
+def file_stamp(input_path: Path) -> str:
+    stat = input_path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def known_fingerprint(input_path: Path, index: dict) -> str | None:
+    """Inhalts-Hash aus dem Index, falls Grösse/Änderungszeit unverändert sind."""
+    known = index["fingerprints"].get(input_path.name)
+    if known and known["stempel"] == file_stamp(input_path):
+        return known["hash"]
+    return None
+
+
+def fingerprint(input_path: Path, index: dict) -> str:
+    """Wie known_fingerprint, liest die Datei aber nötigenfalls ganz ein."""
+    content_hash = known_fingerprint(input_path, index)
+    if content_hash is not None:
+        return content_hash
+
+    stamp = file_stamp(input_path)
+    digest = new_digest()
+    with input_path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    index["fingerprints"][input_path.name] = {"stempel": stamp, "hash": digest.hexdigest()}
+    return digest.hexdigest()
+
+
+def entry_key(content_hash: str, filter_column: str, filter_value: str,
+              output_format: str, date_range: str = "") -> str:
+    parts = [content_hash, filter_column, filter_value, output_format]
+    if date_range:
+        parts.append(date_range)
+    return "\x1f".join(parts)
+
+
+def lookup(input_path: Path, filter_column: str, filter_value: str,
+           output_format: str = "csv", date_range: str = "",
+           read_file: bool = True) -> dict | None:
+    """Gibt den Cache-Eintrag zurück, falls die Ausgabe noch existiert.
+
+    read_file=False: eine unbekannte/geänderte Datei nicht extra hashen, sondern
+    als Fehltreffer behandeln (der Hash entsteht dann beim Filtern).
+    """
+    directory = input_path.parent
+    index = load_index(directory)
+    if read_file:
+        content_hash = fingerprint(input_path, index)
+    else:
+        content_hash = known_fingerprint(input_path, index)
+        if content_hash is None:
+            return None
+    key = entry_key(content_hash, filter_column, filter_value, output_format, date_range)
+
+    entry = index["eintraege"].get(key)
+    if entry is not None and not (directory / entry["ausgabe"]).exists():
+        # Ausgabedatei wurde gelöscht -> Eintrag ist wertlos
+        del index["eintraege"][key]
+        entry = None
+    if entry is not None:
+        entry["zuletzt"] = datetime.now().isoformat(timespec="seconds")
+
+    save_index(directory, index)
+    return entry
+
+
+def store(input_path: Path, filter_column: str, filter_value: str, output_format: str,
+          output_path: Path, total_personen: int, date_range: str = "",
+          content_hash: str | None = None, stamp: str | None = None):
+    """content_hash/stamp: beim Filtern mitberechneter Hash und der Stempel der Datei
+    von vor dem Lesen; ohne sie wird der Hash wie bei lookup ermittelt."""
+    directory = input_path.parent
+    index = load_index(directory)
+    if content_hash is None:
+        content_hash = fingerprint(input_path, index)
+    else:
+        index["fingerprints"][input_path.name] = {"stempel": stamp, "hash": content_hash}
+    key = entry_key(content_hash, filter_column, filter_value, output_format, date_range)
+
+    now = datetime.now().isoformat(timespec="seconds")
+    index["eintraege"][key] = {
+        "datei": input_path.name,
+        "spalte": filter_column,
+        "wert": filter_value,
+        "format": output_format,
+        "zeitraum": date_range,
+        "ausgabe": output_path.name,
+        "personen": total_personen,
+        "erstellt": now,
+        "zuletzt": now,
+    }
+    displaced = index.get("verdraengt", [])
+    if output_path.name in displaced:
+        displaced.remove(output_path.name)
+    _evict(index)
+    save_index(directory, index)
+
+
+def _evict(index: dict, max_entries: int = MAX_ENTRIES):
+    entries = index["eintraege"]
+    if len(entries) <= max_entries:
+        return
+    by_age = sorted(entries, key=lambda k: entries[k]["zuletzt"])
+    evicted = [entries.pop(key) for key in by_age[: len(entries) - max_entries]]
+
+    # Ausgabedatei merken, damit "leeren --dateien" sie weiterhin findet
+    still_used = {entry["ausgabe"] for entry in entries.values()}
+    displaced = index.setdefault("verdraengt", [])
+    for entry in evicted:
+        if entry["ausgabe"] not in still_used and entry["ausgabe"] not in displaced:
+            displaced.append(entry["ausgabe"])
+
+    # Fingerprints von Dateien ohne Einträge braucht es nicht mehr
+    used = {entry["datei"] for entry in entries.values()}
+    for name in list(index["fingerprints"]):
+        if name not in used:
+            del index["fingerprints"][name]
+
+
+def purge(directory: Path, delete_outputs: bool = False) -> int:
+    """Leert den Cache; mit delete_outputs werden auch die Ausgabedateien gelöscht
+    (auch die von bereits verdrängten Einträgen)."""
+    index = load_index(directory)
+    n_entries = len(index["eintraege"])
+    if delete_outputs:
+        outputs = [entry["ausgabe"] for entry in index["eintraege"].values()]
+        for name in outputs + index.get("verdraengt", []):
+            (Path(directory) / name).unlink(missing_ok=True)
+    cache_path(directory).unlink(missing_ok=True)
+    return n_entries
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cache von filter.py anzeigen oder leeren.",
+        epilog=f"Der Cache behält höchstens {MAX_ENTRIES} Einträge pro Ordner (Anzahl, "
+               "nicht Grösse). Ausgabedateien verdrängter Einträge bleiben liegen, "
+               "bis sie mit 'leeren --dateien' gelöscht werden.",
+    )
+    sub = parser.add_subparsers(dest="befehl", required=True)
+
+    p_list = sub.add_parser("liste", help="Einträge anzeigen")
+    p_list.add_argument("ordner", nargs="?", default=".")
+
+    p_purge = sub.add_parser("leeren", help="Alle Einträge entfernen")
+    p_purge.add_argument("ordner", nargs="?", default=".")
+    p_purge.add_argument(
+        "--dateien",
+        help="Auch die Ausgabedateien löschen (auch die verdrängter Einträge)",
+        action="store_true",
+    )
+
+    args = parser.parse_args()
+    directory = Path(args.ordner)
+
+    if args.befehl == "leeren":
+        n_entries = purge(directory, args.dateien)
+        print(f"{n_entries} Einträge entfernt.")
+        return
+
+    index = load_index(directory)
+    entries = index["eintraege"].values()
+    displaced = index.get("verdraengt", [])
+    if not entries and not displaced:
+        print("Cache ist leer.")
+        return
+    for entry in sorted(entries, key=lambda e: e["zuletzt"], reverse=True):
+        print(
+            f"{entry['zuletzt']} | Datei={entry['datei']} | "
+            f"Filterspalte={entry['spalte']} | Wert={entry['wert']} | "
+            f"{'Zeitraum=' + entry['zeitraum'] + ' | ' if entry.get('zeitraum') else ''}"
+            f"Format={entry['format']} | Personen={entry['personen']} | "
+            f"Ausgabe={entry['ausgabe']}"
+        )
+    if displaced:
+        print(f"{len(displaced)} Ausgabedateien verdrängter Einträge: {', '.join(displaced)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Aggregations-Kern für auto_plot_bs.py.
+# Die Schlüssel (Jahr, Staatsangehörigkeit, Altersgruppe) werden einmal in
+# Ganzzahl-Codes übersetzt, die Summen landen direkt in einer Jahr × Kategorie-
+# Matrix (np.add.at / np.bincount). Auswahl der Kategorien und "Restliche"
+# werden auf dieser Matrix berechnet, ohne Zwischen-DataFrames (groupby,
+# reset_index, pivot). Reihenfolgen und Summen entsprechen genau denen von
+# groupby(...).sum().sort_values(ascending=False).
+
+
+def factorize(values) -> tuple[np.ndarray, pd.Index]:
+    """Codes 0..n-1 in sortierter Schlüsselreihenfolge (wie groupby), -1 für NaN."""
+    codes, uniques = pd.factorize(values, sort=True)
+    return codes, pd.Index(uniques)
+
+
+def _weights(counts) -> np.ndarray:
+    weights = np.asarray(counts)
+    if weights.dtype.kind == "f":
+        # groupby().sum() überspringt NaN
+        weights = np.where(np.isnan(weights), 0, weights)
+    return weights
+
+
+def bin_codes(values: np.ndarray, bins) -> np.ndarray:
+    """Klassen-Codes wie pd.cut(values, bins, right=True, include_lowest=True),
+    -1 für NaN und Werte ausserhalb der Klassen."""
+    edges = np.asarray(bins, dtype=np.float64)
+    codes = np.searchsorted(edges, values, side="left") - 1
+    codes[values == edges[0]] = 0
+    invalid = np.isnan(values) | (values < edges[0]) | (values > edges[-1])
+    codes[invalid] = -1
+    return codes
+
+
+def sum_matrix(row_codes: np.ndarray, n_rows: int,
+               col_codes: np.ndarray, n_cols: int,
+               counts) -> np.ndarray:
+    """Summe der Gewichte pro (Zeile, Spalte); Codes < 0 werden ignoriert."""
+    weights = _weights(counts)
+    valid = (row_codes >= 0) & (col_codes >= 0)
+    flat = row_codes[valid].astype(np.intp) * n_cols + col_codes[valid]
+
+    if weights.dtype.kind in "iu":
+        # Ganzzahlen exakt (bincount würde in float64 rechnen)
+        out = np.zeros(n_rows * n_cols, dtype=np.int64)
+        np.add.at(out, flat, weights[valid])
+    else:
+        out = np.bincount(flat, weights=weights[valid], minlength=n_rows * n_cols)
+    return out.reshape(n_rows, n_cols)
+
+
+def present_matrix(row_codes: np.ndarray, n_rows: int,
+                   col_codes: np.ndarray, n_cols: int) -> np.ndarray:
+    """True, wo mindestens eine Zeile zu (Zeile, Spalte) existiert."""
+    valid = (row_codes >= 0) & (col_codes >= 0)
+    flat = row_codes[valid].astype(np.intp) * n_cols + col_codes[valid]
+    return np.bincount(flat, minlength=n_rows * n_cols).reshape(n_rows, n_cols) > 0
+
+
+def argsort_desc(values: np.ndarray) -> np.ndarray:
+    """Absteigende Reihenfolge mit derselben Behandlung von Gleichständen wie
+    Series.sort_values(ascending=False)."""
+    idx = np.arange(len(values))[::-1]
+    return idx[values[::-1].argsort(kind="quicksort")][::-1]
+
+
+def share_selection(sums: np.ndarray, min_share: float, max_categories: int) -> np.ndarray:
+    """Indizes der Kategorien mit eigenem Balken (absteigend), Rest -> "Restliche"."""
+    order = argsort_desc(sums)
+    total = sums.sum()
+    keep = order[sums[order] / total >= min_share]
+    return keep[:max_categories]
+
+
+def top_selection(totals: np.ndarray, labels: pd.Index, always: str, max_bands: int) -> list:
+    """`always` (z.B. Schweiz) immer, danach die grössten übrigen bis max_bands."""
+    selected = [always] if always in labels else []
+    for i in argsort_desc(totals):
+        if labels[i] == always:
+            continue
+        if len(selected) >= max_bands:
+            break
+        selected.append(labels[i])
+    return selected
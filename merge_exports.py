@@ -0,0 +1,244 @@
+import argparse
+import csv
+import hashlib
+import heapq
+import tempfile
+from pathlib import Path
+
+from csv_io import RowWriter, base_stem, open_reader, open_text
+from sqlite_store import EXPORT_COLUMNS
+
+# Führt überlappende 100126-Exporte zu einem Datensatz zusammen, z.B. den
+# Gesamtexport, den Matthäus-Auszug und den Matthäus-2023-Auszug davon.
+# Doppelte Zeilen (gleicher natürlicher Schlüssel) werden nur einmal übernommen,
+# widersprüchliche Anzahl-Werte werden in einer _konflikte.csv gemeldet.
+# Bei widersprüchlichen Werten gewinnt die zuerst angegebene Datei.
+#
+# python merge_exports.py gesamt.csv 100126.csv 100126_Wohnviertel-Name_Matthäus1919.csv
+
+DELIMITER = ";"
+
+NATURAL_KEY = ["Datum", "Gemeinde", "Geschlecht", "Staatsangehoerigkeit", "Wohnviertel-ID"]
+COUNT_COLUMN = "Anzahl"
+
+# Ab so vielen Schlüsseln wird auf externes Sortieren umgestellt
+# (ca. 100 Bytes pro Schlüssel im Speicher)
+DEFAULT_MAX_KEYS = 5_000_000
+
+# Zeilen pro sortiertem Zwischenlauf beim externen Sortieren
+RUN_ROWS = 500_000
+
+CONFLICT_FIELDS = NATURAL_KEY + ["Anzahl_behalten", "Anzahl_verworfen", "Datei_verworfen"]
+
+
+class _TooManyKeys(Exception):
+    pass
+
+
+def _key(row: dict) -> tuple:
+    return tuple((row.get(col) or "").strip() for col in NATURAL_KEY)
+
+
+def _key_digest(key: tuple) -> bytes:
+    # 8 Byte statt des ganzen Tupels – Kollisionen sind bei einigen Millionen
+    # Schlüsseln praktisch ausgeschlossen
+    return hashlib.blake2b("\x1f".join(key).encode("utf-8"), digest_size=8).digest()
+
+
+def _iter_files(input_files: list[str]):
+    """Liefert (Dateiindex, Dateiname, Zeile) über alle Eingaben hinweg."""
+    for file_index, input_file in enumerate(input_files):
+        input_path = Path(input_file)
+        with open_text(input_path) as f_in:
+            for row in open_reader(f_in, DELIMITER):
+                yield file_index, input_path.name, row
+
+
+def _read_header(input_file: str) -> list[str]:
+    with open_text(Path(input_file)) as f_in:
+        return open_reader(f_in, DELIMITER).fieldnames
+
+
+def _check_headers(input_files: list[str]) -> list[str]:
+    """Spalten der ersten Datei; alle Eingaben müssen dieselben 100126-Spalten haben.
+
+    Eine zusätzliche Spalte (z.B. "Alter") gehört nicht zum natürlichen Schlüssel –
+    Zeilen, die sich nur darin unterscheiden, würden sonst als Duplikate verworfen.
+    """
+    fieldnames = None
+    for input_file in input_files:
+        name = Path(input_file).name
+        header = _read_header(input_file) or []
+        missing = [c for c in NATURAL_KEY + [COUNT_COLUMN] if c not in header]
+        if missing:
+            raise SystemExit(f"Spalten {missing} fehlen in {name}. Vorhanden: {header}")
+        unknown = [c for c in header if c not in EXPORT_COLUMNS]
+        if unknown:
+            raise SystemExit(
+                f"Spalten {unknown} in {name} werden nicht unterstützt "
+                f"(nur 100126-Exporte mit {list(EXPORT_COLUMNS)})."
+            )
+        if fieldnames is None:
+            fieldnames = header
+        elif set(header) != set(fieldnames):
+            raise SystemExit(
+                f"{name} hat andere Spalten als {Path(input_files[0]).name}: "
+                f"{header} statt {fieldnames}"
+            )
+    return fieldnames
+
+
+def _conflict(key: tuple, kept: str, dropped: str, file_name: str) -> dict:
+    row = dict(zip(NATURAL_KEY, key))
+    row.update({
+        "Anzahl_behalten": kept,
+        "Anzahl_verworfen": dropped,
+        "Datei_verworfen": file_name,
+    })
+    return row
+
+
+def _merge_hashed(input_files, writer: RowWriter, conflicts: RowWriter, max_keys: int) -> dict:
+    seen = {}  # Schlüssel-Hash -> Anzahl der behaltenen Zeile
+    stats = {"gelesen": 0, "geschrieben": 0, "konflikte": 0}
+
+    for _, file_name, row in _iter_files(input_files):
+        stats["gelesen"] += 1
+        key = _key(row)
+        digest = _key_digest(key)
+        anzahl = (row.get(COUNT_COLUMN) or "").strip()
+
+        kept = seen.get(digest)
+        if kept is None:
+            if len(seen) >= max_keys:
+                raise _TooManyKeys()
+            seen[digest] = anzahl
+            writer.write(row)
+            stats["geschrieben"] += 1
+        elif kept != anzahl:
+            conflicts.write(_conflict(key, kept, anzahl, file_name))
+            stats["konflikte"] += 1
+
+    return stats
+
+
+def _write_run(rows, fieldnames, tmp_dir: Path, run_index: int) -> Path:
+    rows.sort(key=lambda item: item[0])
+    run_path = tmp_dir / f"lauf_{run_index}.csv"
+    with run_path.open("w", encoding="utf-8", newline="") as f_out:
+        writer = csv.writer(f_out, delimiter=DELIMITER)
+        for (key, file_index, row_index), file_name, row in rows:
+            writer.writerow(
+                [file_index, row_index, file_name] + [row.get(name, "") for name in fieldnames]
+            )
+    return run_path
+
+
+def _read_run(run_path: Path, fieldnames):
+    with run_path.open("r", encoding="utf-8", newline="") as f_in:
+        for values in csv.reader(f_in, delimiter=DELIMITER):
+            row = dict(zip(fieldnames, values[3:]))
+            yield (_key(row), int(values[0]), int(values[1])), values[2], row
+
+
+def _merge_external(input_files, fieldnames, writer: RowWriter, conflicts: RowWriter,
+                    run_rows: int) -> dict:
+    """Sortier-Merge über Zwischenläufe auf der Platte; Ausgabe nach Schlüssel sortiert."""
+    stats = {"gelesen": 0, "geschrieben": 0, "konflikte": 0}
+
+    with tempfile.TemporaryDirectory(prefix="merge_exports_") as tmp:
+        tmp_dir = Path(tmp)
+        run_paths = []
+        rows = []
+        for file_index, file_name, row in _iter_files(input_files):
+            rows.append(((_key(row), file_index, stats["gelesen"]), file_name, row))
+            stats["gelesen"] += 1
+            if len(rows) >= run_rows:
+                run_paths.append(_write_run(rows, fieldnames, tmp_dir, len(run_paths)))
+                rows = []
+        if rows:
+            run_paths.append(_write_run(rows, fieldnames, tmp_dir, len(run_paths)))
+        rows = []
+
+        # Gleiche Schlüssel kommen direkt hintereinander, die früheste Datei zuerst
+        current_key = None
+        kept = None
+        merged = heapq.merge(*(_read_run(p, fieldnames) for p in run_paths),
+                             key=lambda item: item[0])
+        for (key, _, _), file_name, row in merged:
+            anzahl = (row.get(COUNT_COLUMN) or "").strip()
+            if key != current_key:
+                current_key = key
+                kept = anzahl
+                writer.write(row)
+                stats["geschrieben"] += 1
+            elif kept != anzahl:
+                conflicts.write(_conflict(key, kept, anzahl, file_name))
+                stats["konflikte"] += 1
+
+    return stats
+
+
+def merge_exports(output_file: str,
+                  input_files: list[str],
+                  max_keys: int = DEFAULT_MAX_KEYS,
+                  external: bool = False,
+                  run_rows: int = RUN_ROWS) -> dict:
+    output_path = Path(output_file)
+    conflict_path = output_path.with_name(base_stem(output_path) + "_konflikte.csv")
+    fieldnames = _check_headers(input_files)
+
+    stats = None
+    if not external:
+        try:
+            with RowWriter(output_path, fieldnames) as writer, \
+                 RowWriter(conflict_path, CONFLICT_FIELDS) as conflicts:
+                stats = _merge_hashed(input_files, writer, conflicts, max_keys)
+        except _TooManyKeys:
+            print(f"Mehr als {max_keys} Schlüssel – wechsle auf externes Sortieren.")
+
+    if stats is None:
+        with RowWriter(output_path, fieldnames) as writer, \
+             RowWriter(conflict_path, CONFLICT_FIELDS) as conflicts:
+            stats = _merge_external(input_files, fieldnames, writer, conflicts, run_rows)
+
+    print(f"Gelesene Zeilen: {stats['gelesen']}")
+    print(f"Geschriebene Zeilen: {stats['geschrieben']} "
+          f"({stats['gelesen'] - stats['geschrieben']} Duplikate entfernt)")
+    if stats["konflikte"]:
+        print(f"Achtung: {stats['konflikte']} widersprüchliche Anzahl-Werte, "
+              f"siehe {conflict_path}")
+    else:
+        conflict_path.unlink()
+    print(f"Zusammengeführte Daten gespeichert in: {output_path}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Überlappende 100126-Exporte ohne Doppelzählungen zusammenführen."
+    )
+    parser.add_argument("output", help="Ausgabedatei (.csv, .csv.gz, .csv.zst, .parquet, .feather)")
+    parser.add_argument("input_csv", nargs="+", help="Eingabedateien, die erste hat Vorrang")
+    parser.add_argument(
+        "--max-schluessel",
+        type=int,
+        default=DEFAULT_MAX_KEYS,
+        help="Ab dieser Schlüsselzahl extern sortieren (Standard: 5'000'000)",
+    )
+    parser.add_argument(
+        "--extern",
+        help="Direkt extern sortieren (Ausgabe nach Schlüssel sortiert)",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    for input_file in args.input_csv:
+        if not Path(input_file).exists():
+            raise SystemExit(f"Datei nicht gefunden: {input_file}")
+
+    merge_exports(args.output, args.input_csv, args.max_schluessel, args.extern)
+
+
+if __name__ == "__main__":
+    main()
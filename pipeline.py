@@ -0,0 +1,289 @@
+import argparse
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from csv_io import OUTPUT_FORMATS, RowWriter, base_stem, open_reader, open_text
+from datum_parser import DATE_COLUMN, parse_bound, range_label
+from filter import (
+    COUNT_COLUMN,
+    DELIMITER,
+    append_count_log,
+    check_columns,
+    filtered_path,
+    parse_count,
+    row_matcher,
+)
+import staatCounter
+
+# Verkettet filter.py -> staatCounter.py / auto_plot_bs.py im Speicher.
+# Die Zeilen laufen als Blöcke (Listen von dicts) durch alle Stufen, ohne dass
+# dazwischen CSVs geschrieben und wieder eingelesen werden.
+# Zwischendateien gibt es nur mit --zwischendateien.
+#
+# z.B. python pipeline.py 100126.csv --filter "Wohnviertel-Name=Matthäus" \
+#          --filter "Datum=31. Dezember 2023" --zaehlen --plot
+# Stichtag-Bereich als eigene Stufe: --von "31. Dezember 2020" --bis 2023-12-31
+
+BATCH_ROWS = 10_000
+
+
+def read_batches(reader, batch_size: int = BATCH_ROWS):
+    """Liest Zeilen aus einem DictReader blockweise."""
+    batch = []
+    for row in reader:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def filter_batches(batches, filter_column: str, filter_value: str):
+    """Gleiche Bedingung wie filter_rows, aber auf Blöcken."""
+    return filter_batches_by(batches, row_matcher(filter_column, filter_value))
+
+
+def filter_batches_by(batches, matches):
+    """Wie filter_batches, aber mit beliebiger Bedingung (z.B. Datumsbereich)."""
+    for batch in batches:
+        kept = [row for row in batch if matches(row)]
+        if kept:
+            yield kept
+
+
+def _filter_stage(batches, stage: dict, writer: RowWriter | None = None):
+    # Zählt die Personen der Stufe mit und schreibt sie auf Wunsch weg
+    for batch in filter_batches_by(batches, stage["matches"]):
+        stage["personen"] += sum(parse_count(row.get(COUNT_COLUMN)) for row in batch)
+        if writer is not None:
+            writer.write_rows(batch)
+        yield batch
+
+
+def parse_filter(spec: str) -> tuple[str, str]:
+    """'Spalte=Wert' -> ('Spalte', 'Wert')"""
+    if "=" not in spec:
+        raise SystemExit(f"Ungültiger Filter '{spec}', erwartet wird 'Spalte=Wert'.")
+    column, value = spec.split("=", 1)
+    return column.strip(), value.strip()
+
+
+def run_pipeline(input_file: str,
+                 filters: list[tuple[str, str]],
+                 save_intermediate: bool = False,
+                 output_format: str = "csv",
+                 count_output: str | None = None,
+                 plot_output: str | None = None,
+                 use_pie: bool = False,
+                 nationality_filter: str | None = None,
+                 von=None,
+                 bis=None) -> dict:
+    """Führt alle Stufen in einem Durchgang über die Eingabedatei aus.
+
+    count_output / plot_output: None = Stufe auslassen, "" = Standardname.
+    von / bis: Stichtag-Bereich als zusätzliche Stufe nach den Spaltenfiltern.
+    Gibt die Personenzahlen je Filterstufe und (falls gezählt) den Counter zurück.
+    """
+    input_path = Path(input_file)
+
+    now = datetime.now()
+    timestamp_for_filename = now.strftime("%H%M")
+    timestamp_for_log = now.strftime("%Y-%m-%d %H:%M")
+
+    count_log_path = input_path.with_name("Anzahl.txt")
+
+    # Name, den die Datei nach jeder Stufe bei Einzelaufrufen von filter.py hätte
+    stage_specs = [(column, value, row_matcher(column, value)) for column, value in filters]
+    if von or bis:
+        stage_specs.append((DATE_COLUMN, range_label(von, bis), row_matcher(von=von, bis=bis)))
+
+    stages = []
+    stage_path = input_path
+    for column, value, matches in stage_specs:
+        source_name = stage_path.name
+        stage_path = filtered_path(
+            stage_path, column, value, timestamp_for_filename, output_format
+        )
+        stages.append({
+            "column": column,
+            "value": value,
+            "matches": matches,
+            "source_name": source_name,
+            "path": stage_path,
+            "personen": 0,
+        })
+
+    counter = Counter() if count_output is not None else None
+    frames = [] if plot_output is not None else None
+    writers = []
+
+    with open_text(input_path) as f_in:
+        reader = open_reader(f_in, DELIMITER)
+        fieldnames = reader.fieldnames
+
+        for stage in stages:
+            check_columns(fieldnames, stage["column"])
+        if counter is not None:
+            staatCounter.check_column(fieldnames)
+
+        try:
+            batches = read_batches(reader)
+            for stage in stages:
+                writer = None
+                if save_intermediate:
+                    writer = RowWriter(stage["path"], fieldnames)
+                    writers.append(writer)
+                batches = _filter_stage(batches, stage, writer)
+
+            for batch in batches:
+                if counter is not None:
+                    staatCounter.count_rows(batch, counter)
+                if frames is not None:
+                    import pandas as pd
+                    frames.append(pd.DataFrame(batch, columns=fieldnames))
+        finally:
+            for writer in writers:
+                writer.close()
+
+    for stage in stages:
+        append_count_log(
+            count_log_path, timestamp_for_log, stage["source_name"],
+            stage["column"], stage["value"], stage["personen"],
+        )
+        print(
+            f"Filter {stage['column']}={stage['value']}: "
+            f"{stage['personen']} Personen (Summe aus '{COUNT_COLUMN}')"
+        )
+        if save_intermediate:
+            print(f"Zwischenergebnis gespeichert in: {stage['path']}")
+    if stages:
+        print(f"Einträge in {count_log_path.name} hinzugefügt.")
+
+    if counter is not None:
+        count_path = (
+            Path(count_output) if count_output
+            else staatCounter.default_output_path(stage_path)
+        )
+        staatCounter.write_counts(counter, stage_path.name, count_path)
+        print(f"Staatsangehörigkeiten gespeichert in: {count_path}")
+
+    if frames is not None:
+        title_parts = [f"{stage['column']} {stage['value']}" for stage in stages]
+        _plot(frames, stage_path, title_parts, plot_output, use_pie, nationality_filter)
+
+    return {
+        "personen": [stage["personen"] for stage in stages],
+        "staatsangehoerigkeiten": counter,
+    }
+
+
+def _plot(frames, stage_path: Path, title_parts: list[str], plot_output: str,
+          use_pie: bool, nationality_filter: str | None):
+    import pandas as pd
+    from auto_plot_bs import auto_plot, numeric_columns
+
+    if not frames:
+        raise SystemExit("Nach dem Filtern sind keine Daten mehr vorhanden.")
+    df = numeric_columns(pd.concat(frames, ignore_index=True))
+
+    if plot_output:
+        output_path = Path(plot_output)
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+        output_path = stage_path.with_name(f"{base_stem(stage_path)}_gesamt_{timestamp}.png")
+
+    title_prefix = " – ".join(title_parts) if title_parts else "Gesamt"
+
+    auto_plot(
+        df,
+        output_path,
+        title_prefix=title_prefix,
+        use_pie=use_pie,
+        nationality_filter=nationality_filter,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Filtern, Zählen und Plotten in einem Durchgang (ohne Zwischendateien)."
+    )
+    parser.add_argument("input_csv", help="Pfad zur CSV-Datei (auch .gz/.zst)")
+    parser.add_argument(
+        "--filter",
+        action="append",
+        default=[],
+        metavar="SPALTE=WERT",
+        help="Filterstufe, mehrfach angebbar (wird der Reihe nach angewendet)",
+    )
+    parser.add_argument(
+        "--von",
+        help="Nur Stichtage ab diesem Datum (z.B. '31. Dezember 2020' oder 2020-12-31)",
+        default=None,
+    )
+    parser.add_argument(
+        "--bis",
+        help="Nur Stichtage bis zu diesem Datum (einschliesslich)",
+        default=None,
+    )
+    parser.add_argument(
+        "--zwischendateien",
+        help="Ergebnis jeder Filterstufe zusätzlich als Datei speichern",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(OUTPUT_FORMATS),
+        default="csv",
+        help="Format der Zwischendateien (Standard: csv)",
+    )
+    parser.add_argument(
+        "--zaehlen",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DATEI",
+        help="Staatsangehörigkeiten zählen (wie staatCounter.py)",
+    )
+    parser.add_argument(
+        "--plot",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="DATEI",
+        help="Diagramm erzeugen (wie auto_plot_bs.py)",
+    )
+    parser.add_argument(
+        "--cycle",
+        help="Bei Einzeljahr (Nationalitäten) Kreisdiagramm statt Balkendiagramm",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--nationality",
+        help="Optional: Verlauf einer bestimmten Staatsangehörigkeit (z.B. 'Ukraine')",
+        default=None,
+    )
+
+    args = parser.parse_args()
+
+    input_path = Path(args.input_csv)
+    if not input_path.exists():
+        raise SystemExit(f"Datei nicht gefunden: {input_path}")
+
+    run_pipeline(
+        args.input_csv,
+        [parse_filter(spec) for spec in args.filter],
+        save_intermediate=args.zwischendateien,
+        output_format=args.format,
+        count_output=args.zaehlen,
+        plot_output=args.plot,
+        use_pie=args.cycle,
+        nationality_filter=args.nationality,
+        von=parse_bound(args.von),
+        bis=parse_bound(args.bis),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+import argparse
+import hashlib
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from csv_io import open_reader, open_text
+from datum_parser import in_range
+
+# Lokale SQLite-Datenbank für 100126-Exporte.
+# Statt jedes Mal die ganze CSV zu scannen, werden die Exporte einmal importiert
+# (Dimensionstabellen für Wohnviertel, Staatsangehörigkeit, Geschlecht und Datum,
+# Indizes auf den üblichen Filterspalten). filter.py, staatCounter.py und
+# auto_plot_bs.py akzeptieren die .db-Datei dann direkt als Eingabe.
+#
+# python sqlite_store.py import bs.db 100126.csv
+# python sqlite_store.py abfrage bs.db --quartier Matthäus --jahr 2023
+
+DELIMITER = ";"
+
+DB_SUFFIXES = {".db", ".sqlite", ".sqlite3"}
+
+# Spalten des 100126-Exports -> SQL-Ausdruck in der Abfrage
+EXPORT_COLUMNS = {
+    "Datum": "d.text",
+    "Gemeinde": "b.gemeinde",
+    "Geschlecht": "g.code",
+    "Staatsangehoerigkeit": "s.name",
+    "Anzahl": "b.anzahl",
+    "Jahr": "d.jahr",
+    "Wohnviertel-Name": "w.name",
+    "Wohnviertel-ID": "w.wohnviertel_id",
+}
+INTEGER_COLUMNS = {"Anzahl", "Jahr"}
+
+# Spalten, die beim Import vorhanden sein müssen
+REQUIRED_COLUMNS = ["Datum", "Gemeinde", "Geschlecht", "Staatsangehoerigkeit", "Anzahl"]
+# Andere Spalten (z.B. "Alter" im 100128-Export) hätten keinen Platz im Schlüssel
+# von bestand – die Zeilen würden sich beim Import gegenseitig überschreiben.
+
+IMPORT_BATCH_ROWS = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wohnviertel (
+    id INTEGER PRIMARY KEY,
+    wohnviertel_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE (wohnviertel_id, name)
+);
+CREATE TABLE IF NOT EXISTS staatsangehoerigkeit (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS geschlecht (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS datum (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE,
+    jahr INTEGER
+);
+CREATE TABLE IF NOT EXISTS bestand (
+    datum_id INTEGER NOT NULL REFERENCES datum(id),
+    gemeinde TEXT NOT NULL,
+    geschlecht_id INTEGER NOT NULL REFERENCES geschlecht(id),
+    staat_id INTEGER NOT NULL REFERENCES staatsangehoerigkeit(id),
+    wohnviertel_id INTEGER NOT NULL REFERENCES wohnviertel(id),
+    anzahl INTEGER NOT NULL,
+    PRIMARY KEY (datum_id, gemeinde, geschlecht_id, staat_id, wohnviertel_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_bestand_wohnviertel ON bestand (wohnviertel_id, datum_id);
+CREATE INDEX IF NOT EXISTS idx_bestand_staat ON bestand (staat_id, datum_id);
+CREATE INDEX IF NOT EXISTS idx_datum_jahr ON datum (jahr);
+CREATE INDEX IF NOT EXISTS idx_wohnviertel_name ON wohnviertel (name);
+CREATE TABLE IF NOT EXISTS importe (
+    sha256 TEXT PRIMARY KEY,
+    datei TEXT NOT NULL,
+    zeilen INTEGER NOT NULL,
+    importiert TEXT NOT NULL
+);
+"""
+
+FROM_CLAUSE = """
+FROM bestand b
+JOIN datum d ON d.id = b.datum_id
+JOIN geschlecht g ON g.id = b.geschlecht_id
+JOIN staatsangehoerigkeit s ON s.id = b.staat_id
+JOIN wohnviertel w ON w.id = b.wohnviertel_id
+"""
+
+
+def is_database(path: Path) -> bool:
+    return Path(path).suffix.lower() in DB_SUFFIXES
+
+
+def connect(db_path: Path) -> sqlite3.Connection:
+    """Nur lesend öffnen – eine fehlende Datei wird nicht als leere Datenbank angelegt."""
+    db_path = Path(db_path)
+    if not db_path.exists():
+        raise SystemExit(f"Datei nicht gefunden: {db_path}")
+    return sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _year_of(row: dict) -> int | None:
+    # Jahr-Spalte bevorzugen, sonst aus "31. Dezember 2023" ablesen
+    for raw in ((row.get("Jahr") or "").strip(), (row.get("Datum") or "").strip()[-4:]):
+        if raw.isdigit():
+            return int(raw)
+    return None
+
+
+def _dimension_id(conn, cache: dict, table: str, columns: tuple, values: tuple,
+                  extra: dict | None = None) -> int:
+    key = values
+    if key in cache:
+        return cache[key]
+    where = " AND ".join(f"{col} = ?" for col in columns)
+    found = conn.execute(f"SELECT id FROM {table} WHERE {where}", values).fetchone()
+    if found is None:
+        extra = extra or {}
+        insert_cols = list(columns) + list(extra)
+        placeholders = ", ".join("?" for _ in insert_cols)
+        cursor = conn.execute(
+            f"INSERT INTO {table} ({', '.join(insert_cols)}) VALUES ({placeholders})",
+            values + tuple(extra.values()),
+        )
+        cache[key] = cursor.lastrowid
+    else:
+        cache[key] = found[0]
+    return cache[key]
+
+
+def import_export(db_path: Path, input_file: str) -> int:
+    """Importiert einen 100126-Export. Gibt die Anzahl importierter Zeilen zurück.
+
+    Eine bereits importierte Datei (gleicher Inhalt) wird übersprungen; überlappende
+    Dateien überschreiben sich auf dem natürlichen Schlüssel statt doppelt zu zählen.
+    """
+    input_path = Path(input_file)
+    sha = file_sha256(input_path)
+
+    with open_text(input_path) as f_in:
+        reader = open_reader(f_in, DELIMITER)
+        missing = [c for c in REQUIRED_COLUMNS if c not in reader.fieldnames]
+        if missing:
+            raise SystemExit(
+                f"Spalten {missing} fehlen in {input_path.name}. "
+                f"Vorhanden: {reader.fieldnames}"
+            )
+        unknown = [c for c in reader.fieldnames if c not in EXPORT_COLUMNS]
+        if unknown:
+            raise SystemExit(
+                f"Spalten {unknown} in {input_path.name} werden nicht unterstützt "
+                f"(nur 100126-Exporte mit {list(EXPORT_COLUMNS)})."
+            )
+
+        # Schema erst nach der Prüfung anlegen, sonst bleibt eine leere Datenbank liegen
+        conn = sqlite3.connect(str(db_path))
+        try:
+            conn.executescript(SCHEMA)
+            if conn.execute("SELECT 1 FROM importe WHERE sha256 = ?", (sha,)).fetchone():
+                print(f"{input_path.name} ist bereits importiert – übersprungen.")
+                return 0
+
+            with conn:
+                n_rows = _import_rows(conn, reader)
+                conn.execute(
+                    "INSERT INTO importe (sha256, datei, zeilen, importiert) VALUES (?, ?, ?, ?)",
+                    (sha, input_path.name, n_rows, datetime.now().strftime("%Y-%m-%d %H:%M")),
+                )
+        finally:
+            conn.close()
+
+    print(f"{n_rows} Zeilen aus {input_path.name} nach {db_path} importiert.")
+    return n_rows
+
+
+def _import_rows(conn, reader) -> int:
+    from filter import parse_count
+
+    caches = {"datum": {}, "geschlecht": {}, "staat": {}, "wohnviertel": {}}
+    n_rows = 0
+    batch = []
+    for row in reader:
+        datum_text = (row.get("Datum") or "").strip()
+        datum_id = _dimension_id(
+            conn, caches["datum"], "datum", ("text",), (datum_text,),
+            {"jahr": _year_of(row)},
+        )
+        geschlecht_id = _dimension_id(
+            conn, caches["geschlecht"], "geschlecht", ("code",),
+            ((row.get("Geschlecht") or "").strip(),),
+        )
+        staat_id = _dimension_id(
+            conn, caches["staat"], "staatsangehoerigkeit", ("name",),
+            ((row.get("Staatsangehoerigkeit") or "").strip(),),
+        )
+        wohnviertel_id = _dimension_id(
+            conn, caches["wohnviertel"], "wohnviertel", ("wohnviertel_id", "name"),
+            ((row.get("Wohnviertel-ID") or "").strip(),
+             (row.get("Wohnviertel-Name") or "").strip()),
+        )
+        batch.append((
+            datum_id,
+            (row.get("Gemeinde") or "").strip(),
+            geschlecht_id,
+            staat_id,
+            wohnviertel_id,
+            parse_count(row.get("Anzahl")),
+        ))
+        if len(batch) >= IMPORT_BATCH_ROWS:
+            n_rows += _insert_batch(conn, batch)
+            batch = []
+    n_rows += _insert_batch(conn, batch)
+    return n_rows
+
+
+def _insert_batch(conn, batch) -> int:
+    conn.executemany(
+        "INSERT OR REPLACE INTO bestand "
+        "(datum_id, gemeinde, geschlecht_id, staat_id, wohnviertel_id, anzahl) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        batch,
+    )
+    return len(batch)
+
+
+def _where(conditions: dict) -> tuple[str, list]:
+    """{'Wohnviertel-Name': 'Matthäus', 'Jahr': 2023} -> WHERE-Klausel + Parameter
+
+    Eine Liste als Wert wird zu "IN (...)".
+    """
+    clauses = []
+    params = []
+    for column, value in conditions.items():
+        if value is None:
+            continue
+        if column not in EXPORT_COLUMNS:
+            raise KeyError(
+                f"Spalte '{column}' nicht gefunden. Verfügbare Spalten: {list(EXPORT_COLUMNS)}"
+            )
+        if isinstance(value, list):
+            clauses.append(f"{EXPORT_COLUMNS[column]} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+            continue
+        if column in INTEGER_COLUMNS and str(value).strip().isdigit():
+            value = int(value)
+        clauses.append(f"{EXPORT_COLUMNS[column]} = ?")
+        params.append(value)
+    if not clauses:
+        return "", params
+    return "WHERE " + " AND ".join(clauses), params
+
+
+def datum_texts(db_path: Path, von=None, bis=None) -> list[str]:
+    """Datum-Werte der Datenbank, deren Stichtag zwischen von und bis liegt.
+
+    Die Texte ("31. Dezember 2023") lassen sich in SQL nicht vergleichen; die
+    wenigen verschiedenen Werte werden hier geparst und als IN-Liste abgefragt.
+    """
+    conn = connect(db_path)
+    try:
+        texts = [text for (text,) in conn.execute("SELECT text FROM datum")]
+    finally:
+        conn.close()
+    return [text for text in texts if in_range(text, von, bis)]
+
+
+def iter_rows(db_path: Path, conditions: dict | None = None):
+    """Zeilen im Format des 100126-Exports (alle Werte als Text), wie ein DictReader."""
+    where, params = _where(conditions or {})
+    select = ", ".join(EXPORT_COLUMNS.values())
+    # Verbindung sofort öffnen (nicht erst beim ersten next()), damit eine fehlende
+    # Datei abbricht, bevor der Aufrufer seine Ausgabe anlegt
+    conn = connect(db_path)
+    return _iter_query(conn, f"SELECT {select} {FROM_CLAUSE} {where}", params)
+
+
+def _iter_query(conn, sql: str, params: list):
+    try:
+        for values in conn.execute(sql, params):
+            yield {
+                name: "" if value is None else str(value)
+                for name, value in zip(EXPORT_COLUMNS, values)
+            }
+    finally:
+        conn.close()
+
+
+def count_nationalities(db_path: Path, conditions: dict | None = None) -> dict:
+    """Einträge pro Staatsangehörigkeit (wie staatCounter.py, aber als SQL)."""
+    where, params = _where(conditions or {})
+    conn = connect(db_path)
+    try:
+        return dict(conn.execute(
+            f"SELECT s.name, COUNT(*) {FROM_CLAUSE} {where} "
+            f"{'AND' if where else 'WHERE'} s.name != '' GROUP BY s.name",
+            params,
+        ))
+    finally:
+        conn.close()
+
+
+def persons_per_nationality(db_path: Path, quartier: str | None = None,
+                            jahr: int | None = None) -> list[tuple[str, int]]:
+    """Personen pro Staatsangehörigkeit, absteigend sortiert."""
+    where, params = _where({"Wohnviertel-Name": quartier, "Jahr": jahr})
+    conn = connect(db_path)
+    try:
+        return conn.execute(
+            f"SELECT s.name, SUM(b.anzahl) AS personen {FROM_CLAUSE} {where} "
+            f"GROUP BY s.name ORDER BY personen DESC, s.name",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+def load_aggregated(db_path: Path, quartier: str | None = None, jahr: int | None = None):
+    """Für auto_plot: bereits in SQL nach Stichtag/Wohnviertel/Staatsangehörigkeit summiert.
+
+    auto_plot summiert danach nochmals – auf den vorsummierten Zeilen ergibt das
+    dieselben Zahlen wie auf dem vollen Export.
+    """
+    import pandas as pd
+
+    where, params = _where({"Wohnviertel-Name": quartier, "Jahr": jahr})
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(
+            f'SELECT d.text AS "Datum", d.jahr AS "Jahr", w.name AS "Wohnviertel-Name", '
+            f's.name AS "Staatsangehoerigkeit", SUM(b.anzahl) AS "Anzahl" '
+            f"{FROM_CLAUSE} {where} GROUP BY d.id, w.name, s.name",
+            conn,
+            params=params,
+        )
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="100126-Exporte in SQLite verwalten.")
+    sub = parser.add_subparsers(dest="befehl", required=True)
+
+    p_import = sub.add_parser("import", help="CSV-Exporte importieren (auch .gz/.zst)")
+    p_import.add_argument("db", help="SQLite-Datei, z.B. bs.db")
+    p_import.add_argument("input_csv", nargs="+")
+
+    p_query = sub.add_parser("abfrage", help="Personen pro Staatsangehörigkeit")
+    p_query.add_argument("db")
+    p_query.add_argument("--quartier", default=None, help="Wohnviertel-Name, z.B. 'Matthäus'")
+    p_query.add_argument("--jahr", type=int, default=None)
+
+    args = parser.parse_args()
+    db_path = Path(args.db)
+
+    if args.befehl == "import":
+        for input_file in args.input_csv:
+            import_export(db_path, input_file)
+        return
+
+    if not db_path.exists():
+        raise SystemExit(f"Datei nicht gefunden: {db_path}")
+    print("Staatsangehoerigkeit\tPersonen")
+    print("-" * 40)
+    for nat, personen in persons_per_nationality(db_path, args.quartier, args.jahr):
+        print(f"{nat}\t{personen}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-import csv
 import sys
 from pathlib import Path
 from collections import Counter
 
+from csv_io import base_stem, open_reader, open_text
+import sqlite_store
+
 # In CH/DE sind CSVs oft mit ';' getrennt.
 DELIMITER = ";"
 
@@ -10,44 +12,65 @@ DELIMITER = ";"
 COLUMN_NAME = "Staatsangehoerigkeit"
 
 
-def count_nationalities(input_file: str, output_file: str | None = None):
-    input_path = Path(input_file)
-
-    # Default: gleicher Name, aber _staatsangehoerigkeiten.txt
-    if output_file is None:
-        output_path = input_path.with_name(input_path.stem + "_staatsangehoerigkeiten.txt")
-    else:
-        output_path = Path(output_file)
-
-    counter = Counter()
+def check_column(fieldnames):
+    if COLUMN_NAME not in fieldnames:
+        raise KeyError(
+            f"Spalte '{COLUMN_NAME}' nicht gefunden. "
+            f"Gefundene Spalten: {fieldnames}"
+        )
 
-    # WICHTIG: utf-8-sig entfernt das BOM (\ufeff) am Anfang
-    with input_path.open(mode="r", encoding="utf-8-sig", newline="") as f_in:
-        reader = csv.DictReader(f_in, delimiter=DELIMITER)
 
-        if COLUMN_NAME not in reader.fieldnames:
-            raise KeyError(
-                f"Spalte '{COLUMN_NAME}' nicht gefunden. "
-                f"Gefundene Spalten: {reader.fieldnames}"
-            )
+def count_rows(rows, counter: Counter | None = None) -> Counter:
+    """Zählt Einträge pro Staatsangehörigkeit (leere Einträge werden ignoriert)."""
+    if counter is None:
+        counter = Counter()
+    for row in rows:
+        nat = (row.get(COLUMN_NAME) or "").strip()
+        if nat:  # leere Einträge ignorieren
+            counter[nat] += 1
+    return counter
 
-        for row in reader:
-            nat = (row.get(COLUMN_NAME) or "").strip()
-            if nat:  # leere Einträge ignorieren
-                counter[nat] += 1
 
+def write_counts(counter: Counter, source_name: str, output_path: Path):
     # Sortieren nach Staatsangehörigkeit (alphabetisch)
     sorted_items = sorted(counter.items(), key=lambda x: x[0])
 
     total = sum(counter.values())
     with output_path.open(mode="w", encoding="utf-8") as f_out:
-        f_out.write(f"Auswertung Staatsangehörigkeit für Datei: {input_path.name}\n")
+        f_out.write(f"Auswertung Staatsangehörigkeit für Datei: {source_name}\n")
         f_out.write(f"Gesamtanzahl Einträge mit Staatsangehörigkeit: {total}\n\n")
         f_out.write("Staatsangehoerigkeit\tAnzahl\n")
         f_out.write("-" * 40 + "\n")
         for nat, count in sorted_items:
             f_out.write(f"{nat}\t{count}\n")
 
+
+def default_output_path(input_path: Path) -> Path:
+    # Default: gleicher Name, aber _staatsangehoerigkeiten.txt
+    return input_path.with_name(base_stem(input_path) + "_staatsangehoerigkeiten.txt")
+
+
+def count_nationalities(input_file: str, output_file: str | None = None):
+    input_path = Path(input_file)
+
+    if output_file is None:
+        output_path = default_output_path(input_path)
+    else:
+        output_path = Path(output_file)
+
+    if sqlite_store.is_database(input_path):
+        # Datenbank aus sqlite_store.py: direkt per GROUP BY zählen
+        counter = Counter(sqlite_store.count_nationalities(input_path))
+    else:
+        # WICHTIG: utf-8-sig entfernt das BOM (\ufeff) am Anfang,
+        # .gz/.zst/... werden dabei direkt entpackt gelesen
+        with open_text(input_path) as f_in:
+            reader = open_reader(f_in, DELIMITER)
+            check_column(reader.fieldnames)
+            counter = count_rows(reader)
+
+    write_counts(counter, input_path.name, output_path)
+
     print(f"Fertig. Ergebnis gespeichert in: {output_path}")
 
 
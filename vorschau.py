@@ -0,0 +1,399 @@
+import csv
+import math
+import random
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+
+from auto_plot_bs import (
+    AGE_BINS,
+    AGE_LABELS,
+    MAX_CATEGORIES,
+    MIN_SHARE_FOR_OWN_CATEGORY,
+    POSSIBLE_AGE_COLS,
+    POSSIBLE_COUNT_COLS,
+    POSSIBLE_DATE_COLS,
+    POSSIBLE_NAT_COLS,
+    POSSIBLE_QUARTER_COLS,
+    POSSIBLE_YEAR_COLS,
+    guess_col,
+    period_label,
+)
+from csv_io import DELIMITER, compression_of, open_reader, open_text
+from datum_parser import in_range, parse_datum
+from filter import parse_count
+
+# Schnelle Vorschau für auto_plot_bs.py --preview.
+# Statt die ganze Datei mit pandas zu laden, wird sie gestreamt und pro Jahr eine
+# nach 'Anzahl' gewichtete Stichprobe (Reservoir mit Zurücklegen) gezogen.
+# Jede Stichprobenstelle steht für eine zufällig gezogene Person; die Anteile
+# werden daraus geschätzt und mit 95%-Fehlerbalken gezeichnet.
+# Unkomprimierte CSVs werden in Blöcken fester Grösse in zufälliger Reihenfolge
+# gelesen: läuft das Zeitbudget ab, stammen die gelesenen Zeilen trotzdem aus der
+# ganzen Datei. Komprimierte Dateien lassen sich nur von vorne lesen – dort deckt
+# ein abgebrochener Durchgang nur den Dateianfang ab, und es werden keine
+# Fehlerbalken gezeichnet (die setzen eine Zufallsstichprobe voraus).
+# Wurde nicht alles gelesen, zeigt das Diagramm Anteile in % statt Personenzahlen.
+# Enthält ein Jahr mehrere Stichtage, wird wie in auto_plot pro Stichtag statt
+# pro Jahr gruppiert.
+
+DEFAULT_SAMPLE_SIZE = 2000
+DEFAULT_TIME_BUDGET = 5.0  # Sekunden
+
+# Wie oft (in Zeilen) die Uhr beim Lesen von vorne geprüft wird
+CLOCK_CHECK_ROWS = 2048
+
+# Blockgrösse beim Lesen in zufälliger Reihenfolge (unkomprimierte CSVs)
+BLOCK_BYTES = 1 << 18
+
+Z_95 = 1.96
+
+
+class WeightedReservoir:
+    """Gewichtete Stichprobe mit Zurücklegen über einen Stream.
+
+    Jede der `size` Stellen enthält unabhängig ein Element mit Wahrscheinlichkeit
+    Gewicht / Gesamtgewicht. Pro neuem Element wird per geometrischem Sprung nur
+    über die Stellen iteriert, die tatsächlich ersetzt werden.
+    """
+
+    def __init__(self, size: int, rng: random.Random):
+        self.size = size
+        self.rng = rng
+        self.total = 0
+        self.slots = []
+
+    def add(self, item, weight: int):
+        if weight <= 0:
+            return
+        self.total += weight
+        p = weight / self.total
+        if p >= 1.0:
+            self.slots = [item] * self.size
+            return
+
+        log_q = math.log1p(-p)
+        i = -1
+        while True:
+            # Anzahl übersprungener Stellen ist geometrisch verteilt
+            i += 1 + int(math.log(1.0 - self.rng.random()) / log_q)
+            if i >= self.size:
+                break
+            self.slots[i] = item
+
+    def estimates(self) -> dict:
+        """Kategorie -> (Anteil, Standardfehler des Anteils)"""
+        counts = Counter(self.slots)
+        n = len(self.slots)
+        result = {}
+        for category, hits in counts.items():
+            share = hits / n
+            result[category] = (share, math.sqrt(share * (1 - share) / n))
+        return result
+
+
+def age_group(raw_age: str) -> str | None:
+    """Altersgruppe wie pd.cut(..., AGE_BINS, right=True, include_lowest=True)."""
+    try:
+        age = float((raw_age or "").strip())
+    except ValueError:
+        return None
+    if math.isnan(age) or age < AGE_BINS[0]:
+        return None
+    index = max(bisect_left(AGE_BINS, age) - 1, 0)
+    return AGE_LABELS[index] if index < len(AGE_LABELS) else None
+
+
+def _random_block_rows(input_path: Path, rng: random.Random, deadline: float, progress: dict):
+    """Zeilen einer unkomprimierten CSV, blockweise in zufälliger Reihenfolge.
+
+    Eine Zeile gehört zu dem Block, in dem sie beginnt. Die Exporte enthalten
+    keine Zeilenumbrüche innerhalb von Feldern, daher genügt das Trennen an \n.
+    progress["complete"] wird False, wenn das Zeitbudget vor dem letzten Block
+    abläuft.
+    """
+    with input_path.open("rb") as f:
+        header = f.readline()
+        fieldnames = next(csv.reader([header.decode("utf-8-sig")], delimiter=DELIMITER))
+        progress["fieldnames"] = fieldnames
+        yield None  # Spalten sind bekannt
+
+        data_start = f.tell()
+        size = input_path.stat().st_size
+        starts = list(range(data_start, size, BLOCK_BYTES))
+        rng.shuffle(starts)
+
+        for n_done, start in enumerate(starts):
+            if n_done > 0 and time.monotonic() > deadline:
+                progress["complete"] = False
+                return
+            end = min(start + BLOCK_BYTES, size)
+
+            pos = start
+            f.seek(start)
+            if start > data_start:
+                # Angeschnittene Zeile gehört zum vorherigen Block
+                f.seek(start - 1)
+                if f.read(1) != b"\n":
+                    pos += len(f.readline())
+            lines = []
+            while pos < end:
+                line = f.readline()
+                if not line:
+                    break
+                pos += len(line)
+                lines.append(line.decode("utf-8"))
+            yield from csv.DictReader(lines, fieldnames=fieldnames, delimiter=DELIMITER)
+
+
+def _sequential_rows(input_path: Path, deadline: float, progress: dict):
+    """Zeilen von vorne; nach Ablauf des Zeitbudgets ist Schluss."""
+    with open_text(input_path) as f_in:
+        reader = open_reader(f_in)
+        progress["fieldnames"] = reader.fieldnames
+        yield None  # Spalten sind bekannt
+
+        for n_rows, row in enumerate(reader, start=1):
+            if n_rows % CLOCK_CHECK_ROWS == 0 and time.monotonic() > deadline:
+                progress["complete"] = False
+                return
+            yield row
+
+
+def sample_file(input_path: Path,
+                quartier: str | None = None,
+                jahr: int | None = None,
+                von=None,
+                bis=None,
+                sample_size: int = DEFAULT_SAMPLE_SIZE,
+                time_budget: float = DEFAULT_TIME_BUDGET,
+                seed: int | None = None) -> dict:
+    """Streamt die Datei und zieht pro Jahr (bzw. Stichtag) eine nach Anzahl
+    gewichtete Stichprobe."""
+    rng = random.Random(seed)
+    deadline = time.monotonic() + time_budget
+
+    reservoirs = {}
+    rows_read = 0
+    progress = {"complete": True}
+    random_blocks = compression_of(Path(input_path)) is None
+
+    if random_blocks:
+        rows = _random_block_rows(Path(input_path), rng, deadline, progress)
+    else:
+        rows = _sequential_rows(Path(input_path), deadline, progress)
+    try:
+        next(rows)
+        columns = progress["fieldnames"]
+
+        year_col = guess_col(POSSIBLE_YEAR_COLS, columns, "Jahr")
+        count_col = guess_col(POSSIBLE_COUNT_COLS, columns, "Anzahl")
+        quarter_col = guess_col(POSSIBLE_QUARTER_COLS, columns, "Wohnviertel-Name",
+                                required=quartier is not None)
+        date_col = guess_col(POSSIBLE_DATE_COLS, columns, "Datum", required=bool(von or bis))
+        age_col = guess_col(POSSIBLE_AGE_COLS, columns, "Alter", required=False)
+        category_col = age_col or guess_col(POSSIBLE_NAT_COLS, columns, "Staatsangehörigkeit")
+
+        for row in rows:
+            rows_read += 1
+            if quartier is not None and row.get(quarter_col) != quartier:
+                continue
+            try:
+                year = int(float(row.get(year_col) or ""))
+            except ValueError:
+                continue
+            if jahr is not None and year != jahr:
+                continue
+            if (von or bis) and not in_range(row.get(date_col), von, bis):
+                continue
+
+            if age_col:
+                category = age_group(row.get(age_col))
+            else:
+                category = (row.get(category_col) or "").strip() or None
+            if category is None:
+                continue
+
+            key = (year, parse_datum(row.get(date_col)) if date_col else None)
+            reservoir = reservoirs.get(key)
+            if reservoir is None:
+                reservoir = reservoirs[key] = WeightedReservoir(sample_size, rng)
+            reservoir.add(category, parse_count(row.get(count_col)))
+    finally:
+        rows.close()
+
+    reservoirs, period_name = _by_period(reservoirs)
+    return {
+        "reservoirs": {p: r for p, r in sorted(reservoirs.items()) if r.slots},
+        "period_name": period_name,
+        "rows_read": rows_read,
+        "complete": progress["complete"],
+        # Abgebrochen, aber über die ganze Datei verteilt gelesen?
+        "random_blocks": random_blocks,
+        "age_mode": age_col is not None,
+        "sample_size": sample_size,
+    }
+
+
+def _by_period(reservoirs: dict) -> tuple[dict, str]:
+    """(Jahr, Stichtag) -> Reservoir  wird zu  Jahr -> Reservoir, solange jedes Jahr
+    nur einen Stichtag hat, sonst zu Stichtag -> Reservoir (wie period_column).
+
+    Stichtage, die sich nicht parsen lassen, fallen im zweiten Fall weg.
+    """
+    stichtage = defaultdict(set)
+    for year, stichtag in reservoirs:
+        stichtage[year].add(stichtag)
+    if all(len(s) == 1 for s in stichtage.values()):
+        return {year: r for (year, _), r in reservoirs.items()}, "Jahr"
+    return {
+        stichtag: r for (_, stichtag), r in reservoirs.items() if stichtag is not None
+    }, "Stichtag"
+
+
+def _select_categories(shares: dict, age_mode: bool, n_years: int) -> list[str]:
+    # Gleiche Auswahl wie in auto_plot, aber auf den geschätzten Anteilen
+    if age_mode:
+        return [g for g in AGE_LABELS if g in shares]
+
+    ranked = sorted(shares, key=lambda c: shares[c], reverse=True)
+    if n_years == 1:
+        keep = [c for c in ranked if shares[c] >= MIN_SHARE_FOR_OWN_CATEGORY]
+        return keep[:MAX_CATEGORIES]
+
+    selected = ["Schweiz"] if "Schweiz" in shares else []
+    for nat in ranked:
+        if nat == "Schweiz":
+            continue
+        if len(selected) >= 10:
+            break
+        selected.append(nat)
+    return selected
+
+
+def preview_plot(sample: dict, output_path: Path, title_prefix: str = ""):
+    reservoirs = sample["reservoirs"]
+    if not reservoirs:
+        raise SystemExit("Nach dem Filtern sind keine Daten mehr vorhanden.")
+
+    years = list(reservoirs)
+    period_name = sample["period_name"]
+    age_mode = sample["age_mode"]
+    rest_name = "Restliche"
+
+    # Über alle Jahre bzw. Stichtage gepoolte Anteile (für Auswahl und Beschriftung)
+    grand_total = sum(r.total for r in reservoirs.values())
+    pooled = Counter()
+    for reservoir in reservoirs.values():
+        for category, (share, _) in reservoir.estimates().items():
+            pooled[category] += share * reservoir.total / grand_total
+    selected = _select_categories(pooled, age_mode, len(years))
+
+    note = (
+        f"Vorschau: Stichprobe {sample['sample_size']} pro {period_name}, "
+        f"{sample['rows_read']} Zeilen gelesen"
+    )
+    # Fehlerbalken nur, wenn die Zeilen aus der ganzen Datei stammen
+    show_errors = sample["complete"] or sample["random_blocks"]
+    if not sample["complete"] and sample["random_blocks"]:
+        note += (
+            " (Zeitbudget erreicht – zufällig verteilte Blöcke der Datei gelesen;"
+            " Anteile statt Personenzahlen)"
+        )
+    elif not sample["complete"]:
+        note += (
+            " (Zeitbudget erreicht – nur der Anfang der Datei ist erfasst, keine Stichprobe"
+            " über die ganze Datei; Anteile ohne Fehlerbalken)"
+        )
+    print(note)
+
+    # Vollständig gelesen: Anteil × Summe = geschätzte Personen, sonst nur Anteil in %
+    if sample["complete"]:
+        scale = {year: r.total for year, r in reservoirs.items()}
+        value_label = "Anzahl Personen (geschätzt)"
+    else:
+        scale = {year: 100.0 for year in reservoirs}
+        value_label = (
+            "Anteil in % (geschätzt)" if show_errors else "Anteil in % (nur Dateianfang)"
+        )
+    what = "Altersstruktur" if age_mode else "Nationalitätenverteilung"
+
+    if len(years) == 1:
+        year = years[0]
+        reservoir = reservoirs[year]
+        estimates = reservoir.estimates()
+
+        labels = list(selected)
+        shares = [estimates[c][0] for c in labels]
+        errors = [estimates[c][1] for c in labels]
+        rest_share = 1.0 - sum(shares)
+        if not age_mode and rest_share > 1e-9:
+            shown = set(labels)
+            rest_hits = sum(1 for s in reservoir.slots if s not in shown)
+            n = len(reservoir.slots)
+            labels.append(rest_name)
+            shares.append(rest_share)
+            errors.append(math.sqrt(rest_hits / n * (1 - rest_hits / n) / n))
+
+        persons = [s * scale[year] for s in shares]
+        persons_err = [Z_95 * e * scale[year] if show_errors else 0.0 for e in errors]
+
+        fig, ax = plt.subplots(figsize=(10, max(5, len(labels) * 0.4)))
+        order = sorted(range(len(labels)), key=lambda i: persons[i]) if not age_mode \
+            else list(range(len(labels)))
+        ax.barh(
+            [labels[i] for i in order],
+            [persons[i] for i in order],
+            xerr=[persons_err[i] for i in order] if show_errors else None,
+            capsize=3,
+        )
+        for pos, i in enumerate(order):
+            error_text = f" ±{Z_95 * errors[i] * 100:.1f}" if show_errors else ""
+            ax.annotate(
+                f"≈{shares[i] * 100:.1f}%{error_text}",
+                (persons[i] + persons_err[i], pos),
+                xytext=(4, 0), textcoords="offset points", va="center", fontsize=8,
+            )
+        ax.set_xlabel(value_label)
+        ax.set_ylabel("Altersgruppe" if age_mode else "Staatsangehörigkeit")
+        ax.set_title(f"{title_prefix} – {what} {period_label(year)} (Vorschau)")
+        ax.grid(axis="x", linestyle=":", alpha=0.5)
+    else:
+        estimates = {year: r.estimates() for year, r in reservoirs.items()}
+        stack = {
+            c: [estimates[y].get(c, (0.0, 0.0))[0] * scale[y] for y in years]
+            for c in selected
+        }
+        if not age_mode:
+            stack[rest_name] = [
+                scale[y] - sum(stack[c][i] for c in selected)
+                for i, y in enumerate(years)
+            ]
+
+        # Beschriftung mit gepooltem Anteil und (falls sinnvoll) Fehler (95%)
+        n_total = sample["sample_size"] * len(years)
+        labels = []
+        for category in stack:
+            share = pooled.get(category, 1.0 - sum(pooled[c] for c in selected))
+            err = Z_95 * math.sqrt(max(share * (1 - share), 0.0) / n_total)
+            error_text = f" ±{err * 100:.1f}" if show_errors else ""
+            labels.append(f"{category} (≈{share * 100:.1f}%{error_text})")
+
+        fig, ax = plt.subplots(figsize=(12, 6))
+        ax.stackplot(years, list(stack.values()), labels=labels)
+        ax.set_xlabel(period_name)
+        ax.set_ylabel(value_label)
+        ax.set_title(f"{title_prefix} – {what} nach {period_name} (Vorschau)")
+        ax.legend(title="Altersgruppe" if age_mode else "Staatsangehörigkeit",
+                  loc="upper left", ncol=2, fontsize=8)
+        ax.grid(True, axis="y", linestyle=":", alpha=0.5)
+
+    fig.text(0.01, 0.01, note, fontsize=7, alpha=0.7)
+    plt.tight_layout(rect=(0, 0.03, 1, 1))
+    fig.savefig(str(output_path), dpi=150)
+    plt.close(fig)
+
+    print(f"Gespeichert als: {output_path}")